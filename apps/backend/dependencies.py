@@ -118,7 +118,8 @@ def require_step_up(user: dict = Depends(get_current_user)) -> dict:
     if not user.get("step_up"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
-            detail="Step-up authentication required"
+            detail="Step-up authentication required",
+            headers={"X-Error-Code": "step_up_required"}
         )
     
     # Step-up is valid for 5 minutes
@@ -126,7 +127,8 @@ def require_step_up(user: dict = Depends(get_current_user)) -> dict:
     if not step_up_at or (datetime.utcnow().timestamp() - step_up_at) > 300:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
-            detail="Step-up authentication expired"
+            detail="Step-up authentication expired",
+            headers={"X-Error-Code": "step_up_expired"}
         )
     return user
 
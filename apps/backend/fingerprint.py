@@ -3,6 +3,7 @@ Device Fingerprinting for Token Binding
 Generates and validates device fingerprints to prevent session hijacking
 """
 import hashlib
+import hmac
 from typing import Optional
 from fastapi import Request
 
@@ -71,11 +72,11 @@ class DeviceFingerprint:
         
         if strict:
             # Exact match required
-            return current_fingerprint == stored_fingerprint
+            return hmac.compare_digest(current_fingerprint, stored_fingerprint)
         else:
             # Allow some variation (e.g., IP change within subnet)
             # For now, we'll use exact match but this can be relaxed
-            return current_fingerprint == stored_fingerprint
+            return hmac.compare_digest(current_fingerprint, stored_fingerprint)
     
     @staticmethod
     def get_fingerprint_info(request: Request) -> dict:
@@ -102,3 +103,13 @@ class DeviceFingerprint:
 def get_device_fingerprint(request: Request) -> str:
     """Helper function to get device fingerprint from request"""
     return DeviceFingerprint.generate(request)
+
+
+def fingerprint_digest(fingerprint: Optional[str]) -> Optional[str]:
+    """
+    Fixed-size digest of a fingerprint for storage alongside tokens.
+    Compare two digests with hmac.compare_digest.
+    """
+    if not fingerprint:
+        return None
+    return hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
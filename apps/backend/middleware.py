@@ -32,6 +32,8 @@ def add_cors(app: FastAPI):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Lets the frontend read structured error codes such as step_up_required
+        expose_headers=["X-Error-Code"],
     )
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
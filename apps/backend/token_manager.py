@@ -4,41 +4,131 @@ Implements secure token rotation to prevent replay attacks
 """
 import secrets
 import hashlib
+import hmac
 from datetime import datetime, timedelta
 from typing import Optional, Dict
+from collections import OrderedDict
+import atexit
 import json
 import os
+import threading
+import time
+from fingerprint import fingerprint_digest
 
 class RefreshTokenManager:
     """
     Manages refresh tokens with rotation and invalidation.
     Tokens are stored in-memory (can be extended to Redis/DB)
+    
+    Used (rotated) tokens are kept for family invalidation, but only up to
+    max_tokens entries in total; beyond that the least recently touched
+    used tokens are evicted. Live tokens are never evicted.
+    
+    Writes are coalesced: a burst of changes within save_debounce seconds is
+    persisted once. Newly issued tokens are always written immediately.
     """
     
-    def __init__(self, storage_path: str = "/tmp/refresh_tokens.json"):
+    def __init__(
+        self,
+        storage_path: str = "/tmp/refresh_tokens.json",
+        max_tokens: int = 10000,
+        save_debounce: float = 0.05
+    ):
         self.storage_path = storage_path
-        self.tokens: Dict[str, dict] = {}
+        self.max_tokens = max_tokens
+        self.save_debounce = save_debounce
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._flush_timer: Optional[threading.Timer] = None
+        self.tokens: "OrderedDict[str, dict]" = OrderedDict()
+        self._by_user: Dict[str, set] = {}
+        self._rotated_from: Dict[str, str] = {}  # child hash -> parent hash
         self._load_tokens()
+        atexit.register(self.flush)
     
     def _load_tokens(self):
         """Load tokens from persistent storage"""
         if os.path.exists(self.storage_path):
             try:
                 with open(self.storage_path, 'r') as f:
-                    self.tokens = json.load(f)
+                    self.tokens = OrderedDict(json.load(f))
+                self._rebuild_index()
                 # Clean expired tokens on load
                 self._cleanup_expired()
             except Exception:
-                self.tokens = {}
+                self.tokens = OrderedDict()
+                self._by_user = {}
+                self._rotated_from = {}
+    
+    def _rebuild_index(self):
+        """Rebuild the username -> token hashes and child -> parent indexes"""
+        self._by_user = {}
+        self._rotated_from = {}
+        for token_hash, data in self.tokens.items():
+            if 'fingerprint' in data:
+                # Older stores kept the plaintext fingerprint
+                data['fp_hash'] = fingerprint_digest(data.pop('fingerprint'))
+            self._by_user.setdefault(data['username'], set()).add(token_hash)
+            if data.get('rotated_to'):
+                self._rotated_from[data['rotated_to']] = token_hash
+    
+    def _drop(self, token_hash: str):
+        """Remove a token and its index entry"""
+        data = self.tokens.pop(token_hash, None)
+        if data is None:
+            return
+        self._rotated_from.pop(token_hash, None)
+        if data.get('rotated_to'):
+            self._rotated_from.pop(data['rotated_to'], None)
+        hashes = self._by_user.get(data['username'])
+        if hashes is not None:
+            hashes.discard(token_hash)
+            if not hashes:
+                del self._by_user[data['username']]
     
-    def _save_tokens(self):
-        """Save tokens to persistent storage"""
-        try:
-            os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
-            with open(self.storage_path, 'w') as f:
-                json.dump(self.tokens, f)
-        except Exception as e:
-            print(f"Warning: Failed to save tokens: {e}")
+    def _evict_used(self):
+        """Evict least recently touched used tokens while over max_tokens"""
+        excess = len(self.tokens) - self.max_tokens
+        if excess <= 0:
+            return
+        victims = []
+        for token_hash, data in self.tokens.items():
+            if data['used']:
+                victims.append(token_hash)
+                if len(victims) == excess:
+                    break
+        for token_hash in victims:
+            self._drop(token_hash)
+    
+    def _save_tokens(self, immediate: bool = False):
+        """Mark tokens dirty and persist them, coalescing writes within save_debounce"""
+        self._dirty = True
+        elapsed = time.monotonic() - self._last_save
+        if immediate or elapsed >= self.save_debounce:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.save_debounce - elapsed, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def flush(self):
+        """Save pending changes to persistent storage"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self._evict_used()
+            try:
+                os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
+                with open(self.storage_path, 'w') as f:
+                    json.dump(self.tokens, f)
+            except Exception as e:
+                print(f"Warning: Failed to save tokens: {e}")
+            self._dirty = False
+            self._last_save = time.monotonic()
     
     def _cleanup_expired(self):
         """Remove expired tokens"""
@@ -48,7 +138,7 @@ class RefreshTokenManager:
             if data['expires_at'] < now
         ]
         for key in expired_keys:
-            del self.tokens[key]
+            self._drop(key)
         if expired_keys:
             self._save_tokens()
     
@@ -69,6 +159,18 @@ class RefreshTokenManager:
         Returns:
             Refresh token string
         """
+        with self._lock:
+            token, _ = self._issue_token(username, fingerprint_digest(fingerprint), expires_days)
+            self._save_tokens(immediate=True)
+            return token
+    
+    def _issue_token(
+        self,
+        username: str,
+        fp_hash: Optional[str],
+        expires_days: int = 7
+    ) -> tuple:
+        """Create and register a token without persisting it. Returns (token, token_hash)"""
         # Generate cryptographically secure random token
         token = secrets.token_urlsafe(32)
         token_hash = hashlib.sha256(token.encode()).hexdigest()
@@ -79,15 +181,14 @@ class RefreshTokenManager:
         # Store token metadata
         self.tokens[token_hash] = {
             'username': username,
-            'fingerprint': fingerprint,
+            'fp_hash': fp_hash,
             'created_at': datetime.utcnow().isoformat(),
             'expires_at': expires_at.isoformat(),
             'used': False,
             'rotated_to': None
         }
-        
-        self._save_tokens()
-        return token
+        self._by_user.setdefault(username, set()).add(token_hash)
+        return token, token_hash
     
     def validate_and_rotate(
         self, 
@@ -104,67 +205,71 @@ class RefreshTokenManager:
         Returns:
             Dict with username and new_token, or None if invalid
         """
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
-        
-        # Check if token exists
-        if token_hash not in self.tokens:
-            return None
-        
-        token_data = self.tokens[token_hash]
-        
-        # Check if already used (rotation already happened)
-        if token_data['used']:
-            # Potential token replay attack - invalidate entire chain
-            self._invalidate_token_family(token_hash)
-            return None
+        with self._lock:
+            token_hash = hashlib.sha256(token.encode()).hexdigest()
+            token_data = self.tokens.get(token_hash)
+            if token_data is None:
+                return None
+            self.tokens.move_to_end(token_hash)
         
-        # Check expiry
-        if datetime.fromisoformat(token_data['expires_at']) < datetime.utcnow():
-            del self.tokens[token_hash]
-            self._save_tokens()
-            return None
+            stored_fp = token_data['fp_hash']
+            fp_hash = fingerprint_digest(fingerprint)
+            expired = datetime.fromisoformat(token_data['expires_at']) < datetime.utcnow()
+            # Already used means rotation happened before: potential replay attack.
+            # Fingerprint mismatch on a live token means potential theft.
+            compromised = token_data['used'] or (
+                not expired and bool(fp_hash and stored_fp)
+                and not hmac.compare_digest(stored_fp, fp_hash)
+            )
         
-        # Check fingerprint if provided
-        if fingerprint and token_data['fingerprint']:
-            if token_data['fingerprint'] != fingerprint:
-                # Fingerprint mismatch - potential theft
+            if compromised:
                 self._invalidate_token_family(token_hash)
                 return None
+            if expired:
+                self._drop(token_hash)
+                self._save_tokens()
+                return None
         
-        # Mark old token as used
-        token_data['used'] = True
-        
-        # Generate new refresh token
-        new_token = self.generate_refresh_token(
-            username=token_data['username'],
-            fingerprint=fingerprint or token_data['fingerprint']
-        )
-        
-        # Link old token to new one (for family tracking)
-        new_token_hash = hashlib.sha256(new_token.encode()).hexdigest()
-        token_data['rotated_to'] = new_token_hash
+            # Issue the replacement and link old -> new (for family tracking),
+            # then persist both changes with a single immediate write
+            new_token, new_token_hash = self._issue_token(
+                username=token_data['username'],
+                fp_hash=fp_hash or stored_fp
+            )
+            token_data['used'] = True
+            token_data['rotated_to'] = new_token_hash
+            self._rotated_from[new_token_hash] = token_hash
         
-        self._save_tokens()
+            self._save_tokens(immediate=True)
         
-        return {
-            'username': token_data['username'],
-            'new_token': new_token
-        }
+            return {
+                'username': token_data['username'],
+                'new_token': new_token
+            }
     
     def _invalidate_token_family(self, token_hash: str):
         """
         Invalidate entire token family (for replay attack detection)
-        Follows the rotation chain and invalidates all tokens
+        Follows the rotation chain in both directions and invalidates all tokens
         """
-        # Invalidate the current token
-        if token_hash in self.tokens:
-            del self.tokens[token_hash]
+        family = [token_hash]
+        
+        # Tokens this one was rotated from
+        parent = self._rotated_from.get(token_hash)
+        while parent is not None:
+            family.append(parent)
+            parent = self._rotated_from.get(parent)
+        
+        # Tokens this one was rotated to
+        data = self.tokens.get(token_hash)
+        child = data.get('rotated_to') if data else None
+        while child is not None:
+            family.append(child)
+            data = self.tokens.get(child)
+            child = data.get('rotated_to') if data else None
         
-        # Find and invalidate all tokens in the family
-        # (tokens that were rotated from this one)
-        for th, data in list(self.tokens.items()):
-            if data.get('rotated_to') == token_hash:
-                self._invalidate_token_family(th)
+        for th in family:
+            self._drop(th)
         
         self._save_tokens()
     
@@ -178,11 +283,12 @@ class RefreshTokenManager:
         Returns:
             True if revoked, False if not found
         """
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
-        if token_hash in self.tokens:
-            self._invalidate_token_family(token_hash)
-            return True
-        return False
+        with self._lock:
+            token_hash = hashlib.sha256(token.encode()).hexdigest()
+            if token_hash in self.tokens:
+                self._invalidate_token_family(token_hash)
+                return True
+            return False
     
     def revoke_all_user_tokens(self, username: str) -> int:
         """
@@ -194,23 +300,23 @@ class RefreshTokenManager:
         Returns:
             Number of tokens revoked
         """
-        count = 0
-        for token_hash, data in list(self.tokens.items()):
-            if data['username'] == username:
-                del self.tokens[token_hash]
-                count += 1
+        with self._lock:
+            hits = self._by_user.pop(username, set())
+            for token_hash in hits:
+                self._drop(token_hash)
         
-        if count > 0:
-            self._save_tokens()
+            if hits:
+                self._save_tokens()
         
-        return count
+            return len(hits)
     
     def get_user_token_count(self, username: str) -> int:
         """Get number of active tokens for a user"""
-        return sum(
-            1 for data in self.tokens.values()
-            if data['username'] == username and not data['used']
-        )
+        with self._lock:
+            return sum(
+                1 for token_hash in self._by_user.get(username, ())
+                if not self.tokens[token_hash]['used']
+            )
 
 
 # Global instance
@@ -227,5 +333,6 @@ def get_token_manager() -> RefreshTokenManager:
         if not storage_path:
             svcs_root = config.get("SVCS_ROOT", "/svcs-data")
             storage_path = os.path.join(svcs_root, "refresh_tokens.json")
-        _token_manager = RefreshTokenManager(storage_path)
+        max_tokens = config.get_int("REFRESH_TOKEN_MAX_ENTRIES", 10000)
+        _token_manager = RefreshTokenManager(storage_path, max_tokens=max_tokens)
     return _token_manager
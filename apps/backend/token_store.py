@@ -1,8 +1,10 @@
 import json
 import os
+import hmac
 from datetime import datetime
 from typing import Optional, Dict
 from config_manager import get_config_manager
+from fingerprint import fingerprint_digest
 
 config = get_config_manager()
 TOKEN_FILE = os.path.join(config.get("SVCS_ROOT", "/svcs-data"), "refresh_tokens.json")
@@ -27,7 +29,7 @@ def store_refresh_token(username: str, token: str, fingerprint: str, expires_at:
         tokens[username] = {}
     
     tokens[username][token] = {
-        "fingerprint": fingerprint,
+        "fp_hash": fingerprint_digest(fingerprint),
         "expires_at": expires_at.isoformat(),
         "created_at": datetime.utcnow().isoformat()
     }
@@ -35,35 +37,31 @@ def store_refresh_token(username: str, token: str, fingerprint: str, expires_at:
 
 def verify_and_rotate_token(username: str, old_token: str, new_token: str, fingerprint: str, expires_at: datetime) -> bool:
     tokens = _load_tokens()
-    user_tokens = tokens.get(username, {})
-    
-    if old_token not in user_tokens:
+    user_tokens = tokens.get(username)
+    row = user_tokens.get(old_token) if user_tokens else None
+    if row is None:
         return False
     
-    token_data = user_tokens[old_token]
+    fp_hash = fingerprint_digest(fingerprint) or ""
+    # Older rows kept the plaintext fingerprint
+    stored_fp = row["fp_hash"] if "fp_hash" in row else fingerprint_digest(row.get("fingerprint"))
+    fp_ok = hmac.compare_digest(stored_fp or "", fp_hash)
+    exp_ok = datetime.fromisoformat(row["expires_at"]) >= datetime.utcnow()
     
-    # Check fingerprint
-    if token_data["fingerprint"] != fingerprint:
+    if not fp_ok:
         # Potential theft! Invalidate all tokens for this user as a precaution
         del tokens[username]
-        _save_tokens(tokens)
-        return False
-    
-    # Check expiry
-    if datetime.fromisoformat(token_data["expires_at"]) < datetime.utcnow():
-        del tokens[username][old_token]
-        _save_tokens(tokens)
-        return False
-    
-    # Rotate: remove old, add new
-    del tokens[username][old_token]
-    tokens[username][new_token] = {
-        "fingerprint": fingerprint,
-        "expires_at": expires_at.isoformat(),
-        "created_at": datetime.utcnow().isoformat()
-    }
+    else:
+        # Old token is consumed whether it expired or is being rotated
+        del user_tokens[old_token]
+        if exp_ok:
+            user_tokens[new_token] = {
+                "fp_hash": fp_hash,
+                "expires_at": expires_at.isoformat(),
+                "created_at": datetime.utcnow().isoformat()
+            }
     _save_tokens(tokens)
-    return True
+    return fp_ok and exp_ok
 
 def invalidate_token(username: str, token: str):
     tokens = _load_tokens()
@@ -1,50 +1,154 @@
 import requests
-import pickle
-import os
-from .utils import API_BASE_URL, TOKEN_FILE, COOKIE_FILE, save_token, load_token
+import atexit
+import json
+import time
+import socket
+import hashlib
+from typing import Optional
+from requests.adapters import HTTPAdapter, Retry
+from .utils import API_BASE_URL, load_state, save_state, load_token, clear_token, token_exp, json_loads, json_dumps
 
-def save_cookies(session):
-    with open(COOKIE_FILE, 'wb') as f:
-        pickle.dump(session.cookies, f)
+# Connection pool for the shared session. Retries only cover connection
+# failures on idempotent methods (urllib3's default), never a POST.
+# HTTP/1.1 keep-alive is enough here: every CLI flow issues its requests one
+# after another (create -> step-up -> retry), so there is nothing for HTTP/2
+# to multiplex, and the default API URL is plain http where h2 isn't offered.
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+MAX_RETRIES = Retry(total=2, backoff_factor=0.2)
+
+# Replaces urllib3's default socket options, so TCP_NODELAY must stay listed
+SOCKET_OPTIONS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+
+# Refresh proactively when the access token has less than this many seconds left
+REFRESH_MARGIN = 30
+
+# Only the attributes needed to rebuild the jar are persisted
+COOKIE_FIELDS = ("name", "value", "domain", "path", "expires", "secure")
+
+# Digest of the jar as last read from or written to the state file
+_last_cookie_digest: Optional[bytes] = None
+
+# Shared by every request in this process so connections are kept alive
+_session: Optional[requests.Session] = None
+
+def _cookie_digest(data: str) -> bytes:
+    return hashlib.blake2b(data.encode(), digest_size=16).digest()
+
+def _cookie_list(cookies):
+    return [{k: getattr(c, k) for k in COOKIE_FIELDS} for c in cookies]
+
+def save_cookies(session, token=None):
+    """Persist the jar, and token if given, in one write; skipped when neither changed"""
+    global _last_cookie_digest
+    cookies = _cookie_list(session.cookies)
+    digest = _cookie_digest(json.dumps(cookies))
+    if digest == _last_cookie_digest and token is None:
+        return
+    if token is None:
+        save_state(cookies=cookies)
+    else:
+        save_state(cookies=cookies, token=token)
+    _last_cookie_digest = digest
 
 def load_cookies(session):
-    if os.path.exists(COOKIE_FILE):
-        with open(COOKIE_FILE, 'rb') as f:
-            session.cookies.update(pickle.load(f))
+    global _last_cookie_digest
+    cookies = load_state().get("cookies")
+    if not isinstance(cookies, list):
+        return
+    now = time.time()
+    for c in cookies:
+        # Expired cookies are dropped, so the next save prunes them from disk
+        if c.get("expires") is not None and c["expires"] < now:
+            continue
+        session.cookies.set(**c)
+    _last_cookie_digest = _cookie_digest(json.dumps(cookies))
+
+def clear_cookies():
+    global _last_cookie_digest
+    _last_cookie_digest = None
+    if _session is not None:
+        _session.cookies.clear()
+    save_state(cookies=None)
+
+def _save_session_cookies():
+    # Nothing to persist if the jar was never loaded or was cleared on logout
+    if _session is not None and (len(_session.cookies) or _last_cookie_digest is not None):
+        save_cookies(_session)
+
+class AnchorAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools keep sockets alive"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        # TLS verification is left to requests, so the CA bundle it trusts
+        # (certifi or REQUESTS_CA_BUNDLE) is unchanged
+        kwargs.setdefault("socket_options", SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
 
 def get_session():
-    session = requests.Session()
-    load_cookies(session)
-    return session
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = AnchorAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=MAX_RETRIES)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+        load_cookies(_session)
+        # Cookies set by ordinary responses are written once, on exit
+        atexit.register(_save_session_cookies)
+    return _session
 
-def authenticated_request(method, path, **kwargs):
-    session = get_session()
+def _refresh_access_token(session):
+    """Exchange the refresh cookie for a new access token; returns it, or None on failure"""
+    refresh_res = session.post(f"{API_BASE_URL}/auth/refresh")
+    if refresh_res.status_code != 200:
+        return None
+    new_token = json_loads(refresh_res.content)["access_token"]
+    save_cookies(session, token=new_token)
+    return new_token
+
+def authenticated_request(method, path, session=None, **kwargs):
+    session = session or get_session()
     token = load_token()
+    refresh_attempted = False
+    
+    if token and path != "/auth/refresh":
+        exp = token_exp(token)
+        if exp is not None and exp - time.time() < REFRESH_MARGIN:
+            # Known to be (nearly) expired: refresh now instead of waiting for a 401
+            refresh_attempted = True
+            token = _refresh_access_token(session) or token
+    
+    headers = dict(kwargs.get("headers") or {})
+    if kwargs.get("json") is not None:
+        # Encode the body ourselves so orjson is used when it is installed
+        kwargs["data"] = json_dumps(kwargs.pop("json"))
+        headers["Content-Type"] = "application/json"
     if token:
-        headers = kwargs.get("headers", {})
         headers["Authorization"] = f"Bearer {token}"
-        kwargs["headers"] = headers
+    kwargs["headers"] = headers
     
     url = f"{API_BASE_URL}{path}"
     res = session.request(method, url, **kwargs)
     
     if res.status_code == 401 and path != "/auth/refresh":
-        # Try to refresh
-        print("Access token expired, attempting refresh...")
-        refresh_res = session.post(f"{API_BASE_URL}/auth/refresh")
-        if refresh_res.status_code == 200:
-            new_token = refresh_res.json()["access_token"]
-            save_token(new_token)
-            save_cookies(session)
-            # Retry
-            headers = kwargs.get("headers", {})
+        # Fallback for clock skew or server-side expiry
+        new_token = None
+        if not refresh_attempted:
+            print("Access token expired, attempting refresh...")
+            new_token = _refresh_access_token(session)
+        if new_token:
+            # Retry; release the rejected response's connection first
+            res.close()
+            headers = dict(kwargs.get("headers") or {})
             headers["Authorization"] = f"Bearer {new_token}"
             kwargs["headers"] = headers
             res = session.request(method, url, **kwargs)
         else:
             print("Session expired. Please login again.")
-            if os.path.exists(TOKEN_FILE): os.remove(TOKEN_FILE)
-            if os.path.exists(COOKIE_FILE): os.remove(COOKIE_FILE)
+            clear_token()
+            clear_cookies()
     
-    save_cookies(session)
     return res
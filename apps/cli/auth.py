@@ -2,35 +2,39 @@ import requests
 import os
 import base64
 import hashlib
+import functools
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import padding, ed25519, rsa
 from cryptography.hazmat.primitives import serialization
-from .utils import API_BASE_URL, save_token
+from .utils import API_BASE_URL, json_loads, post_json
 from .api import save_cookies
 
+# Stateless, so one instance serves every RSA signature
+RSA_PADDING = padding.PKCS1v15()
+RSA_HASH = hashes.SHA256()
+
 def login(username, password):
     session = requests.Session()
-    res = session.post(f"{API_BASE_URL}/auth/login", json={"username": username, "password": password})
+    res = post_json(session, f"{API_BASE_URL}/auth/login", {"username": username, "password": password})
     if res.status_code == 200:
-        data = res.json()
+        data = json_loads(res.content)
         if data.get("status") == "2fa_required":
             code = input("2FA Code Required: ")
-            res = session.post(f"{API_BASE_URL}/auth/login/2fa", json={"username": username, "code": code})
+            res = post_json(session, f"{API_BASE_URL}/auth/login/2fa", {"username": username, "code": code})
             if res.status_code == 200:
-                data = res.json()
+                data = json_loads(res.content)
             else:
-                print(f"2FA Login failed: {res.json().get('detail', 'Unknown error')}")
+                print(f"2FA Login failed: {json_loads(res.content).get('detail', 'Unknown error')}")
                 return
 
         if "access_token" in data:
             token = data["access_token"]
-            save_token(token)
-            save_cookies(session)
+            save_cookies(session, token=token)
             print("Login successful!")
         else:
              print(f"Login failed: Missing access token in response: {data}")
     else:
-        print(f"Login failed: {res.json().get('detail', 'Unknown error')}")
+        print(f"Login failed: {json_loads(res.content).get('detail', 'Unknown error')}")
 
 def derive_public_key_and_id(private_key):
     public_key = private_key.public_key()
@@ -54,51 +58,63 @@ def load_private_key(path):
         except Exception:
             raise
 
+@functools.lru_cache(maxsize=8)
+def _load_key_cached(path, mtime_ns, size):
+    private_key = load_private_key(path)
+    return (private_key,) + derive_public_key_and_id(private_key)
+
+def load_key(path):
+    """Return (private_key, public_key_str, key_id), parsing each version of the file once"""
+    st = os.stat(path)
+    return _load_key_cached(path, st.st_mtime_ns, st.st_size)
+
+def get_signer(private_key):
+    """Return a single-argument sign function for the key, or None if unsupported"""
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        # Ed25519 keys use sign() without padding/hash parameters
+        return private_key.sign
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        # RSA keys use sign(data, padding, hash)
+        return lambda msg: private_key.sign(msg, RSA_PADDING, RSA_HASH)
+    return None
+
 def ssh_login(username, key_path):
     try:
-        private_key = load_private_key(os.path.expanduser(key_path))
-        pub_key_str, derived_key_id = derive_public_key_and_id(private_key)
+        private_key, pub_key_str, derived_key_id = load_key(os.path.expanduser(key_path))
         print(f"Using key: {key_path}")
         print(f"Derived Key ID: {derived_key_id}")
     except Exception as e:
         print(f"Error loading private key: {e}")
         return
 
+    sign = get_signer(private_key)
+    if sign is None:
+        print(f"Unsupported key type: {type(private_key)}")
+        return
+
     session = requests.Session()
     res = session.get(f"{API_BASE_URL}/auth/ssh-challenge", params={"username": username})
     if res.status_code != 200:
         print(f"Failed to get challenge: {res.text}")
         return
-    challenge = res.json()["challenge"]
+    challenge = json_loads(res.content)["challenge"]
     
     try:
-        # Ed25519 keys use sign() without padding/hash parameters
-        # RSA keys use sign(data, padding, hash)
-        from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
-        
-        if isinstance(private_key, ed25519.Ed25519PrivateKey):
-            signature = private_key.sign(challenge.encode())
-        elif isinstance(private_key, rsa.RSAPrivateKey):
-            signature = private_key.sign(challenge.encode(), padding.PKCS1v15(), hashes.SHA256())
-        else:
-            print(f"Unsupported key type: {type(private_key)}")
-            return
-            
+        signature = sign(challenge.encode())
         sig_b64 = base64.b64encode(signature).decode()
         
-        res = session.post(f"{API_BASE_URL}/auth/ssh-login", json={
+        res = post_json(session, f"{API_BASE_URL}/auth/ssh-login", {
             "username": username,
             "signature": sig_b64,
             "key_id": derived_key_id
         })
         
         if res.status_code == 200:
-            token = res.json()["access_token"]
-            save_token(token)
-            save_cookies(session)
+            token = json_loads(res.content)["access_token"]
+            save_cookies(session, token=token)
             print("SSH Login successful!")
         else:
-            print(f"SSH Login failed: {res.json().get('detail', 'Unknown error')}")
+            print(f"SSH Login failed: {json_loads(res.content).get('detail', 'Unknown error')}")
             print("Note: The backend ID depends on the exact string uploaded (including comments).")
             print("If you uploaded the key with a comment, this derived ID (no comment) might not match.")
     except Exception as e:
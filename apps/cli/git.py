@@ -1,12 +1,59 @@
 import os
-import zipfile
+import sys
 import io
+import zipfile
 import shutil
+import stat
+import tempfile
 import json
-from .api import authenticated_request, API_BASE_URL
+import hashlib
+import time
+import zlib
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import zstandard
+import msgpack
+
+if orjson is not None:
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps(obj, indent=False):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+else:
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps(obj, indent=False):
+        return json.dumps(obj, indent=2 if indent else None).encode()
 
 ANCHOR_DIR = ".anchor"
 CONFIG_FILE = "config"
+HASH_CHUNK_SIZE = 1 << 20
+STAT_CACHE_FILE = "index.stat"
+# New blobs are stored zstd-compressed; raw .blob files are still read
+ZSTD_BLOB_SUFFIX = ".blob.zst"
+ZSTD_LEVEL = 3
+# Files modified this recently may change again within the same mtime tick,
+# so their hashes are not cached (git's "racy" entries)
+RACY_WINDOW_NS = 2 * 10**9
+# Push archives up to this size are built in memory
+PUSH_SPOOL_SIZE = 64 << 20
+# Larger files are compressed by zipfile itself, streaming from disk
+PARALLEL_DEFLATE_MAX = 16 << 20
+# Downloaded archives up to this size are kept in memory
+DOWNLOAD_SPOOL_SIZE = 256 << 20
+STORED_EXTENSIONS = frozenset((
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp3", ".mp4", ".mkv", ".pdf",
+))
 
 def init(path="."):
     """Initialize a new anchor repo"""
@@ -20,8 +67,9 @@ def init(path="."):
     config = {
         "remote": None
     }
-    with open(os.path.join(anchor_path, CONFIG_FILE), "w") as f:
-        json.dump(config, f)
+    with open(os.path.join(anchor_path, CONFIG_FILE), "wb") as f:
+        f.write(_dumps(config))
+    _read_config.cache_clear()
         
     with open(os.path.join(anchor_path, "HEAD"), "w") as f:
         f.write("refs/heads/main")
@@ -30,6 +78,8 @@ def init(path="."):
 
 def clone(repo_name, destination=None):
     """Clone a repository"""
+    # Imported here so local commands don't pull in requests
+    from .api import authenticated_request, API_BASE_URL
     if not destination:
         destination = repo_name
     
@@ -40,7 +90,10 @@ def clone(repo_name, destination=None):
     print(f"Cloning '{repo_name}'...")
     
     # Check if repo exists and get archive
-    res = authenticated_request("GET", f"/repos/{repo_name}/archive")
+    # The archive is already compressed; don't ask for it to be gzipped again
+    res = authenticated_request(
+        "GET", f"/repos/{repo_name}/archive", stream=True, headers={"Accept-Encoding": "identity"}
+    )
     if res.status_code != 200:
         if res.status_code == 404 and ("Repo is empty" in res.text or "Repo not found" in res.text):
              print("warning: You appear to have cloned an empty repository.")
@@ -56,8 +109,8 @@ def clone(repo_name, destination=None):
 
     # Unzip
     try:
-        with zipfile.ZipFile(io.BytesIO(res.content)) as zf:
-            zf.extractall(destination)
+        with _download_archive(res) as spool, zipfile.ZipFile(spool) as zf:
+            _extract_zip(zf, destination)
     except zipfile.BadZipFile:
         print("Error: Received invalid zip file from server.")
         return
@@ -68,16 +121,13 @@ def clone(repo_name, destination=None):
     # Fetch latest snapshot ID to set HEAD
     hist_res = authenticated_request("GET", f"/repos/{repo_name}/history")
     if hist_res.status_code == 200:
-        history = hist_res.json()
+        history = _loads(hist_res.content)
         
         # Save all history snapshots locally so 'log' works
         for snap in history:
             sid = snap.get("snapshot_id")
             if sid:
-                snap_path = os.path.join(destination, ANCHOR_DIR, "objects", "snapshots", f"{sid}.json")
-                os.makedirs(os.path.dirname(snap_path), exist_ok=True)
-                with open(snap_path, "w") as f:
-                    json.dump(snap, f, indent=2)
+                _write_object(destination, "snapshots", sid, snap)
 
         if history and len(history) > 0:
             latest_id = history[0].get("snapshot_id")
@@ -85,13 +135,11 @@ def clone(repo_name, destination=None):
                 anchor_path = os.path.join(destination, ANCHOR_DIR)
                 ref_path = os.path.join(anchor_path, "refs", "heads", "main")
                 os.makedirs(os.path.dirname(ref_path), exist_ok=True)
-                with open(ref_path, "w") as f:
-                    f.write(latest_id)
+                _atomic_write(ref_path, latest_id)
                 
                 # Create HEAD pointing to main
                 head_path = os.path.join(anchor_path, "HEAD")
-                with open(head_path, "w") as f:
-                    f.write("refs/heads/main")
+                _atomic_write(head_path, "refs/heads/main")
                 # Need snapshot obj content for logging? 
                 # Ideally we should fetch object, but for now we just set ref.
                 # 'log' tool checks objects/snapshots/{id}.json.
@@ -115,43 +163,388 @@ def clone(repo_name, destination=None):
         
     print(f"Cloned '{repo_name}' into '{destination}'.")
 
+_root_cache = {}
+
 def find_root():
     """Find the root of the anchor repository"""
-    path = os.getcwd()
-    while path != "/":
-        if os.path.exists(os.path.join(path, ANCHOR_DIR)):
-            return path
-        path = os.path.dirname(path)
+    cwd = os.getcwd()
+    if cwd in _root_cache:
+        return _root_cache[cwd]
+    path, prev = cwd, None
+    # dirname() is a fixed point at the filesystem root, on any platform
+    while path != prev:
+        try:
+            if stat.S_ISDIR(os.stat(os.path.join(path, ANCHOR_DIR)).st_mode):
+                # Only hits are cached, so a later init in this process is seen
+                _root_cache[cwd] = path
+                return path
+        except OSError:
+            pass
+        prev, path = path, os.path.dirname(path)
     return None
 
+def resolve_head(root):
+    """
+    Resolve HEAD to (ref, commit_id). ref is the branch ref HEAD points to
+    (e.g. "refs/heads/main"), or None when HEAD is detached or missing.
+    commit_id is None when there is nothing to resolve to yet.
+    """
+    try:
+        with open(os.path.join(root, ANCHOR_DIR, "HEAD")) as f:
+            head = f.read().strip()
+    except FileNotFoundError:
+        return None, None
+    if not head.startswith("refs/"):
+        return None, head or None
+    try:
+        with open(os.path.join(root, ANCHOR_DIR, head)) as f:
+            return head, f.read().strip() or None
+    except FileNotFoundError:
+        return head, None
+
+def _iter_worktree(root, rel_dir="", with_stat=True):
+    """
+    Yield (full_path, rel_path, stat) for worktree files, skipping .anchor and
+    .git. With with_stat=False no stat calls are made and stat is None.
+    """
+    subdirs = []
+    with os.scandir(os.path.join(root, rel_dir)) as it:
+        for entry in it:
+            rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            if entry.is_dir():
+                # Like os.walk, symlinked directories are not descended into
+                if entry.name not in (ANCHOR_DIR, ".git") and not entry.is_symlink():
+                    subdirs.append(rel_path)
+                continue
+            st = None
+            if with_stat:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    pass
+            yield entry.path, rel_path, st
+    # Files first, then subdirectories, matching os.walk's top-down order
+    for rel_path in subdirs:
+        yield from _iter_worktree(root, rel_path, with_stat)
+
 def _hash_file(path):
-    import hashlib
-    sha256 = hashlib.sha256()
-    with open(path, "rb") as f:
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        # Python < 3.11: reuse one buffer rather than allocating per chunk
+        sha256 = hashlib.sha256()
+        buf = bytearray(HASH_CHUNK_SIZE)
+        view = memoryview(buf)
         while True:
-            data = f.read(65536)
-            if not data: break
-            sha256.update(data)
+            n = f.readinto(buf)
+            if not n: break
+            sha256.update(view[:n])
     return sha256.hexdigest()
 
-def _load_index(root):
+def _hash_files_parallel(paths, hash_fn=_hash_file):
+    """Hash files concurrently; hashlib releases the GIL while digesting"""
+    if len(paths) < 2:
+        return [hash_fn(p) for p in paths]
+    workers = min(32, (os.cpu_count() or 1) * 2, len(paths))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(hash_fn, paths))
+
+def _materialize_blob(src, dst):
+    """
+    Copy src to dst in the kernel with copy_file_range, which reflinks on
+    copy-on-write filesystems, falling back to shutil.copy. Never hardlinks:
+    a blob must not share an inode with a worktree file that can be edited.
+    Compressed blobs are decompressed into dst.
+    """
+    if src.endswith(ZSTD_BLOB_SUFFIX):
+        with _open_blob(src) as s, open(dst, "wb") as d:
+            shutil.copyfileobj(s, d, HASH_CHUNK_SIZE)
+        return
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                while os.copy_file_range(s.fileno(), d.fileno(), 1 << 30):
+                    pass
+            shutil.copymode(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy(src, dst)
+
+def _store_blob(root, src, blob_hash):
+    """Store the worktree file src as blob blob_hash"""
+    base = _blob_base(root, blob_hash)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+    # An existing blob is trusted as complete, so it must appear atomically
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(base), suffix=".tmp")
+    try:
+        with open(src, "rb") as s, os.fdopen(fd, "wb") as d:
+            cctx.copy_stream(s, d)
+        shutil.copymode(src, tmp)
+        os.replace(tmp, base + ZSTD_BLOB_SUFFIX)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def _hash_and_store_blob(root, src):
+    """
+    Hash src and store it as a blob in a single read: the content is
+    streamed into a temp file under objects/blobs, which is renamed into
+    place once the hash is known. Returns the hash.
+    """
+    blob_dir = os.path.join(root, ANCHOR_DIR, "objects", "blobs")
+    os.makedirs(blob_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=blob_dir, suffix=".tmp")
+    sha256 = hashlib.sha256()
+    try:
+        with open(src, "rb") as s, os.fdopen(fd, "wb") as d:
+            out = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(d, closefd=False)
+            while True:
+                chunk = s.read(HASH_CHUNK_SIZE)
+                if not chunk: break
+                sha256.update(chunk)
+                out.write(chunk)
+            out.close()
+        blob_hash = sha256.hexdigest()
+        if os.path.exists(_get_blob_path(root, blob_hash)):
+            os.unlink(tmp)
+        else:
+            final = _blob_base(root, blob_hash) + ZSTD_BLOB_SUFFIX
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            shutil.copymode(src, tmp)
+            os.replace(tmp, final)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return blob_hash
+
+def _open_blob(blob_path):
+    """Open a blob for binary reading, decompressing if needed"""
+    f = open(blob_path, "rb")
+    if not blob_path.endswith(ZSTD_BLOB_SUFFIX):
+        return f
+    return zstandard.ZstdDecompressor().stream_reader(f, closefd=True)
+
+def _open_blob_text(blob_path, **kwargs):
+    """Open a blob for text reading; kwargs are passed to TextIOWrapper"""
+    with _open_blob(blob_path) as f:
+        data = f.read()
+    return io.TextIOWrapper(io.BytesIO(data), **kwargs)
+
+def _load_stat_cache(root):
+    cache_path = os.path.join(root, ANCHOR_DIR, STAT_CACHE_FILE)
+    try:
+        with open(cache_path, "rb") as f:
+            return _loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_stat_cache(root, cache):
+    cache_path = os.path.join(root, ANCHOR_DIR, STAT_CACHE_FILE)
+    _atomic_write(cache_path, _dumps(cache))
+
+def _deflate_file(path):
+    """Raw-DEFLATE a file at level 1 for a zip entry. Returns (crc, size, data)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    compressor = zlib.compressobj(1, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return zlib.crc32(data), len(data), compressor.compress(data) + compressor.flush()
+
+# Private ZipFile attributes _zip_write_deflated relies on, as found in
+# CPython 3.8 through 3.12; without them entries go through zf.write
+_ZIP_RAW_ATTRS = ("_lock", "_writecheck", "_didModify", "start_dir", "fp", "filelist", "NameToInfo")
+
+def _zip_write_deflated(zf, zinfo, crc, size, payload):
+    """Append an already-deflated entry, as ZipFile.mkdir does for directories"""
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = crc
+    zinfo.file_size = size
+    zinfo.compress_size = len(payload)
+    with zf._lock:
+        zinfo.header_offset = zf.fp.tell()
+        zf._writecheck(zinfo)
+        zf._didModify = True
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+        zf.fp.write(zinfo.FileHeader())
+        zf.fp.write(payload)
+        zf.start_dir = zf.fp.tell()
+
+def _download_archive(res):
+    """Spool a streamed archive response so zipfile can seek in it"""
+    spool = tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_SIZE, suffix=".zip")
+    try:
+        for chunk in res.iter_content(chunk_size=HASH_CHUNK_SIZE):
+            spool.write(chunk)
+    finally:
+        res.close()
+    spool.seek(0)
+    return spool
+
+def _extract_zip(zf, destination):
+    """
+    Extract every member of zf under destination, copying file data straight
+    into the target. Like extractall, absolute paths and '..' are stripped.
+    """
+    made_dirs = set()
+    for zinfo in zf.infolist():
+        parts = [p for p in zinfo.filename.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+        if not parts:
+            continue
+        dest = os.path.join(destination, *parts)
+        parent = dest if zinfo.is_dir() else os.path.dirname(dest)
+        if parent not in made_dirs:
+            os.makedirs(parent, exist_ok=True)
+            made_dirs.add(parent)
+        if zinfo.is_dir():
+            continue
+        if zinfo.file_size == 0:
+            open(dest, "wb").close()
+            continue
+        bufsize = min(zinfo.file_size, HASH_CHUNK_SIZE)
+        with zf.open(zinfo) as src, open(dest, "wb", buffering=bufsize) as dst:
+            shutil.copyfileobj(src, dst, bufsize)
+
+def _write_worktree_zip(zf, entries):
+    """
+    Write (full_path, rel_path, stat) entries to zf. Small files are deflated
+    on a thread pool (zlib releases the GIL) and appended in order.
+    """
+    def should_store(rel_path):
+        # Already-compressed formats gain nothing from DEFLATE
+        return os.path.splitext(rel_path)[1].lower() in STORED_EXTENSIONS
+    
+    raw_write = all(hasattr(zf, attr) for attr in _ZIP_RAW_ATTRS)
+    
+    def compress(entry):
+        full_path, rel_path, st = entry
+        if not raw_write or should_store(rel_path):
+            return None
+        size = st.st_size if st is not None else os.path.getsize(full_path)
+        if size > PARALLEL_DEFLATE_MAX:
+            return None
+        return _deflate_file(full_path)
+    
+    def write(entry, future):
+        full_path, rel_path, _ = entry
+        result = future.result()
+        if result is not None:
+            _zip_write_deflated(zf, zipfile.ZipInfo.from_file(full_path, rel_path), *result)
+        elif should_store(rel_path):
+            zf.write(full_path, rel_path, compress_type=zipfile.ZIP_STORED)
+        else:
+            zf.write(full_path, rel_path)
+    
+    workers = min(32, os.cpu_count() or 1, max(len(entries), 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # A sliding window of futures bounds the compressed data held in memory
+        pending = deque()
+        for entry in entries:
+            pending.append((entry, executor.submit(compress, entry)))
+            if len(pending) >= 2 * workers:
+                write(*pending.popleft())
+        while pending:
+            write(*pending.popleft())
+
+def _hash_worktree_files(root, files, hash_fn=_hash_file):
+    """Hash (rel_path, full_path, stat) tuples, skipping files whose stat matches the cache.
+
+    stat may be None, in which case the file is stat'ed here. Cache misses
+    are hashed with hash_fn.
+
+    The cache maps rel_path -> [size, mtime_ns, ino, hash] of the worktree
+    file, so it stays valid whatever the index currently holds.
+    """
+    cache = _load_stat_cache(root)
+    hashes = [None] * len(files)
+    misses = []
+    for i, (rel_path, full_path, st) in enumerate(files):
+        if st is None:
+            st = os.stat(full_path)
+        key = [st.st_size, st.st_mtime_ns, st.st_ino]
+        entry = cache.get(rel_path)
+        if entry and entry[:3] == key:
+            hashes[i] = entry[3]
+        else:
+            misses.append((i, rel_path, full_path, key))
+    
+    if misses:
+        fresh = _hash_files_parallel([full_path for _, _, full_path, _ in misses], hash_fn)
+        cutoff = time.time_ns() - RACY_WINDOW_NS
+        for (i, rel_path, _, key), file_hash in zip(misses, fresh):
+            hashes[i] = file_hash
+            if key[1] < cutoff:
+                cache[rel_path] = key + [file_hash]
+            else:
+                cache.pop(rel_path, None)
+        _save_stat_cache(root, cache)
+    return hashes
+
+def _atomic_write(path, data):
+    """Write data (bytes or str) to a temp file next to path, then os.replace it into place"""
+    if isinstance(data, str):
+        data = data.encode()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _fsync_dir(path):
+    """Flush a directory's entries to disk; a no-op where directories can't be opened"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _sync_batch(paths, directory):
+    """Flush a batch of newly written files in directory to disk in one go"""
+    if hasattr(os, "sync"):
+        os.sync()
+        return
+    for path in paths:
+        with open(path, "rb+") as f:
+            os.fsync(f.fileno())
+    _fsync_dir(directory)
+
+# Index and config are read once per process; writers clear the caches.
+# The loaders hand out copies because callers edit them before saving.
+@functools.lru_cache(maxsize=4)
+def _read_index(root):
     index_path = os.path.join(root, ANCHOR_DIR, "index")
-    if os.path.exists(index_path):
-        with open(index_path) as f:
-            return json.load(f)
-    return {}
+    try:
+        with open(index_path, "rb") as f:
+            return _loads(f.read())
+    except FileNotFoundError:
+        return {}
 
-def _load_config(root):
+@functools.lru_cache(maxsize=4)
+def _read_config(root):
     config_path = os.path.join(root, ANCHOR_DIR, CONFIG_FILE)
-    if os.path.exists(config_path):
-        with open(config_path) as f:
-            return json.load(f)
-    return {}
+    try:
+        with open(config_path, "rb") as f:
+            return _loads(f.read())
+    except FileNotFoundError:
+        return {}
+
+def _load_index(root):
+    return dict(_read_index(root))
+
+def _load_config(root):
+    return dict(_read_config(root))
 
 def _save_index(root, index):
     index_path = os.path.join(root, ANCHOR_DIR, "index")
-    with open(index_path, "w") as f:
-        json.dump(index, f, indent=2)
+    _atomic_write(index_path, _dumps(index, indent=True))
+    _read_index.cache_clear()
 
 def status():
     root = find_root()
@@ -169,30 +562,24 @@ def status():
     
     # helper to walk
     all_files = set()
-    for r, d, f in os.walk(root):
-        if ".anchor" in d: d.remove(".anchor")
-        if ".git" in d: d.remove(".git")
+    tracked = []
+    for full_path, rel_path, st in _iter_worktree(root):
+        all_files.add(rel_path)
         
-        rel_root = os.path.relpath(r, root)
-        if rel_root == ".": rel_root = ""
-        
-        for file in f:
-            full_path = os.path.join(r, file)
-            rel_path = os.path.join(rel_root, file)
-            all_files.add(rel_path)
-            
-            if rel_path in index:
-                # Check modification
-                current_hash = _hash_file(full_path)
-                if current_hash != index[rel_path]:
-                    modified.append(rel_path)
-            else:
-                untracked.append(rel_path)
+        if rel_path in index:
+            tracked.append((rel_path, full_path, st))
+        else:
+            untracked.append(rel_path)
+    
+    # Check modification
+    hashes = _hash_worktree_files(root, tracked)
+    for (rel_path, _, _), current_hash in zip(tracked, hashes):
+        if current_hash != index[rel_path]:
+            modified.append(rel_path)
                 
     # Check deleted
-    for path in index:
-        if path not in all_files:
-            modified.append(f"{path} (deleted)")
+    for path in sorted(index.keys() - all_files):
+        modified.append(f"{path} (deleted)")
 
     if not modified and not untracked:
         print("nothing to commit, working tree clean")
@@ -206,22 +593,24 @@ def status():
             for f in untracked:
                 print(f"\t{f}")
 
-def add(files):
+def add(files, index=None):
+    """Stage files. If index is given it is updated in place and not saved."""
     root = find_root()
     if not root:
         print("fatal: not a anchor repository")
         return
     
-    index = _load_index(root)
+    save = index is None
+    if save:
+        index = _load_index(root)
     
     # Handle "."
     targets = []
+    file_targets = []
     if files == ["."] or files == ".":
         # Add all
-        for r, d, f in os.walk(root):
-            if ".anchor" in d: d.remove(".anchor")
-            for file in f:
-                targets.append(os.path.join(r, file))
+        for full_path, rel_path, st in _iter_worktree(root):
+            file_targets.append((rel_path, full_path, st))
     else:
         # If files is list
         if isinstance(files, list):
@@ -239,55 +628,135 @@ def add(files):
             # Recurse? For now assume file or explicit list
             pass
         else:
-            rel_path = os.path.relpath(target, root)
-            file_hash = _hash_file(target)
-            
-            # Store blob object locally?
-            # Git stores blobs on add.
-            # Anchor backend stores blobs on snapshot upload (server side rebuilds blobs? No, client sends zip).
-            # The backend `save_snapshot` extracts zip and builds blobs.
-            # So client just needs to track content.
-            # Ideally we keep a copy of the blob locally to avoid relying on worktree for commit generation.
-            
-            blob_dir = os.path.join(root, ANCHOR_DIR, "objects", "blobs", file_hash[:2], file_hash[2:4])
-            os.makedirs(blob_dir, exist_ok=True)
-            blob_path = os.path.join(blob_dir, f"{file_hash}.blob")
+            file_targets.append((os.path.relpath(target, root), target, None))
+    
+    # Files that need hashing are stored as blobs in the same pass;
+    # cache hits only need storing if their blob is missing
+    hashes = _hash_worktree_files(root, file_targets, lambda p: _hash_and_store_blob(root, p))
+    for (rel_path, target, _), file_hash in zip(file_targets, hashes):
+        
+        # Store blob object locally?
+        # Git stores blobs on add.
+        # Anchor backend stores blobs on snapshot upload (server side rebuilds blobs? No, client sends zip).
+        # The backend `save_snapshot` extracts zip and builds blobs.
+        # So client just needs to track content.
+        # Ideally we keep a copy of the blob locally to avoid relying on worktree for commit generation.
+        
+        if not os.path.exists(_get_blob_path(root, file_hash)):
+            _store_blob(root, target, file_hash)
             
-            if not os.path.exists(blob_path):
-                shutil.copy(target, blob_path)
-                
-            index[rel_path] = file_hash
+        index[rel_path] = file_hash
             
-    _save_index(root, index)
+    if save:
+        _save_index(root, index)
 
 def _build_tree_object(index):
     # Flatten index to entries. 
     # Backend expects: {"entries": {"rel/path": {"type": "blob", "id": "hash"}}}
-    entries = {}
-    for path, hash_ in index.items():
-        entries[path] = {"type": "blob", "id": hash_}
+    # Built in sorted key order so _store_object can serialize without re-sorting
+    entries = {path: {"id": hash_, "type": "blob"} for path, hash_ in sorted(index.items())}
     return {"entries": entries}
 
 def _store_object(root, type_, content):
-    import hashlib
-    data_json = json.dumps(content, sort_keys=True)
-    hash_ = hashlib.sha256(data_json.encode()).hexdigest()
+    # content must already be in sorted key order (see _build_tree_object);
+    # the JSON form is what gets hashed, whatever format it is stored in
+    data = json.dumps(content).encode()
+    hash_ = hashlib.sha256(data).hexdigest()
     
-    path = os.path.join(root, ANCHOR_DIR, "objects", type_, f"{hash_}.json")
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w") as f:
-        f.write(data_json)
+    if _has_object(root, type_, hash_):
+        # Content-addressed: an existing object is identical
+        return hash_
+    _write_object(root, type_, hash_, content)
     return hash_
 
+def _read_object_file(path):
+    """Decode a snapshot/tree file: msgpack (.mp) or legacy JSON (.json)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not path.endswith(".mp"):
+        return _loads(data)
+    return msgpack.unpackb(data, raw=False)
+
+def _load_object(root, type_, obj_id):
+    """Load a snapshot or tree object, preferring msgpack; None if missing"""
+    if not obj_id:
+        return None
+    base = os.path.join(root, ANCHOR_DIR, "objects", type_, obj_id)
+    for ext in (".mp", ".json"):
+        try:
+            return _read_object_file(base + ext)
+        except FileNotFoundError:
+            continue
+    return None
+
+def _has_object(root, type_, obj_id):
+    base = os.path.join(root, ANCHOR_DIR, "objects", type_, obj_id)
+    return os.path.exists(base + ".mp") or os.path.exists(base + ".json")
+
+def _encode_object(content):
+    """Return (extension, bytes) for storing an object. New objects are always
+    msgpack, so a repository reads the same wherever it is opened"""
+    return ".mp", msgpack.packb(content, use_bin_type=True)
+
+def _write_object(root, type_, obj_id, content):
+    """Write an object in the storage format (see _encode_object)"""
+    base = os.path.join(root, ANCHOR_DIR, "objects", type_, obj_id)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    # A cached miss (or an overwritten snapshot id) must not be served stale
+    _load_snapshot.cache_clear()
+    _load_tree.cache_clear()
+    ext, data = _encode_object(content)
+    _atomic_write(base + ext, data)
+
+# Snapshots and trees are memoized for the life of the process; callers must
+# not mutate the returned objects. _write_object clears the caches.
+@functools.lru_cache(maxsize=4096)
+def _load_snapshot(root, cid):
+    return _load_object(root, "snapshots", cid)
+
+@functools.lru_cache(maxsize=4096)
+def _load_tree(root, tree_id):
+    return _load_object(root, "trees", tree_id)
+
+def _prefetch_ancestors(root, start, depth=32):
+    """
+    Load the trees a history walk from start would compare, for start and
+    up to depth of its ancestors, concurrently into the _load_tree cache,
+    and return the ids of the commits covered. Hops that keep the parent's
+    root tree are skipped by the walk, so their trees are not fetched.
+    """
+    covered = set()
+    tree_ids = set()
+    cid = start
+    while cid and len(covered) <= depth:
+        snap = _load_snapshot(root, cid)
+        if snap is None:
+            break
+        covered.add(cid)
+        parent = snap.get("parent")
+        if not parent:
+            break
+        psnap = _load_snapshot(root, parent)
+        if psnap is None or psnap.get("root_tree") != snap.get("root_tree"):
+            tree_ids.add(snap.get("root_tree"))
+            if psnap is not None:
+                tree_ids.add(psnap.get("root_tree"))
+        cid = parent
+    tree_ids.discard(None)
+    if len(tree_ids) > 1:
+        with ThreadPoolExecutor(max_workers=min(8, len(tree_ids))) as executor:
+            list(executor.map(lambda tree_id: _load_tree(root, tree_id), tree_ids))
+    return covered
+
 def commit(message, all_flag=False):
     root = find_root()
     if not root:
         print("fatal: not a anchor repository")
         return
 
+    index = _load_index(root)
     if all_flag:
-        # Stage modified and deleted tracked files
-        index = _load_index(root)
+        # Stage modified and deleted tracked files, saving the index once
         to_add = []
         to_remove = []
         
@@ -301,16 +770,15 @@ def commit(message, all_flag=False):
                 to_add.append(full_path)
                 
         if to_add:
-            add(to_add)
+            add(to_add, index=index)
         
         # Handle deletions
-        if to_remove:
-            index = _load_index(root)
-            for p in to_remove:
-                if p in index: del index[p]
+        for p in to_remove:
+            index.pop(p, None)
+        
+        if to_add or to_remove:
             _save_index(root, index)
     
-    index = _load_index(root)
     if not index:
         print("nothing to commit (create/copy files and use 'anchor add' to track)")
         return
@@ -325,30 +793,22 @@ def commit(message, all_flag=False):
     
     # Get parent
     head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-    parent = None
-    if os.path.exists(head_path):
-        with open(head_path) as f:
-            ref = f.read().strip()
-            # ref: refs/heads/main
-            ref_path = os.path.join(root, ANCHOR_DIR, ref)
-            if os.path.exists(ref_path):
-                with open(ref_path) as f:
-                    parent = f.read().strip() or None
-    else:
+    _, parent = resolve_head(root)
+    if not os.path.exists(head_path):
         # Create HEAD
-        with open(head_path, "w") as f:
-            f.write("refs/heads/main")
+        _atomic_write(head_path, "refs/heads/main")
     
     # Create snapshot
     # Backend ID logic: s_{int(sha256(tree + parent)[:8], 16)}
     # We can use our own ID logic locally, but let's try to mimic if we want consistency.
     # But for now, just use hash of json object.
     
-    import hashlib
     # Calculate ID same as backend
     parent_str = parent or ""
     # wait, backend: snapshot_id = f"s_{int(hashlib.sha256((tree_id + parent).encode()).hexdigest()[:8], 16)}"
-    snap_hash = hashlib.sha256((tree_id + parent_str).encode()).hexdigest()[:8]
+    sha256 = hashlib.sha256(tree_id.encode())
+    sha256.update(parent_str.encode())
+    snap_hash = sha256.hexdigest()[:8]
     snapshot_id = f"s_{int(snap_hash, 16)}"
     
     snapshot = {
@@ -360,54 +820,43 @@ def commit(message, all_flag=False):
     }
     
     # Store snapshot object
-    snap_path = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{snapshot_id}.json")
-    os.makedirs(os.path.dirname(snap_path), exist_ok=True)
-    with open(snap_path, "w") as f:
-        json.dump(snapshot, f, indent=2)
+    _write_object(root, "snapshots", snapshot_id, snapshot)
         
     # Update HEAD
     head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
     current_ref = "HEAD" # default name
-    if os.path.exists(head_path):
+    try:
         with open(head_path) as f:
             ref = f.read().strip()
-            
+    except FileNotFoundError:
+        # Should have been created earlier, but fallback
+        ref_path = os.path.join(root, ANCHOR_DIR, "refs", "heads", "main")
+        os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+        _atomic_write(ref_path, snapshot_id)
+        current_ref = "main"
+    else:
         if ref.startswith("refs/"):
             # Update branch ref
             ref_path = os.path.join(root, ANCHOR_DIR, ref)
             os.makedirs(os.path.dirname(ref_path), exist_ok=True)
-            with open(ref_path, "w") as f:
-                f.write(snapshot_id)
+            _atomic_write(ref_path, snapshot_id)
             current_ref = ref.split("/")[-1]
         else:
             # Detached HEAD, update HEAD directly
-            with open(head_path, "w") as f:
-                f.write(snapshot_id)
+            _atomic_write(head_path, snapshot_id)
             current_ref = "detached"
-    else:
-        # Should have been created earlier, but fallback
-        ref_path = os.path.join(root, ANCHOR_DIR, "refs", "heads", "main")
-        os.makedirs(os.path.dirname(ref_path), exist_ok=True)
-        with open(ref_path, "w") as f:
-             f.write(snapshot_id)
-        current_ref = "main"
 
     print(f"[{current_ref} {snapshot_id}] {message}")
 
 def push():
+    from .api import authenticated_request
     root = find_root()
     if not root:
         print("fatal: not a anchor repository")
         return
         
     # Get remote
-    config_path = os.path.join(root, ANCHOR_DIR, CONFIG_FILE)
-    if not os.path.exists(config_path):
-        print("fatal: no remote configured")
-        return
-    with open(config_path) as f:
-        config = json.load(f)
-        
+    config = _load_config(root)
     remote = config.get("remote")
     if not remote:
         print("fatal: no remote configured")
@@ -419,66 +868,54 @@ def push():
     # We upload the current state as a zip
     # We can zip the worktree, excluding .anchor
     
-    import tempfile
-    
     print(f"Pushing to {remote}...")
     
     # Create zip from worktree
     # Respect .ignore? Not implemented.
     # Just zip everything except .anchor and .git
     
-    tf = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
-    tf.close()
+    # Small pushes stay in memory; larger ones spill to disk
+    buf = tempfile.SpooledTemporaryFile(max_size=PUSH_SPOOL_SIZE, suffix=".zip")
     
-    try:
-        with zipfile.ZipFile(tf.name, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for r, d, f in os.walk(root):
-                if ".anchor" in d: d.remove(".anchor")
-                if ".git" in d: d.remove(".git")
-                
-                for file in f:
-                    full_path = os.path.join(r, file)
-                    rel_path = os.path.relpath(full_path, root)
-                    zf.write(full_path, rel_path)
+    with buf:
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            _write_worktree_zip(zf, list(_iter_worktree(root)))
+        buf.seek(0)
         
         # Upload
         # Backend: POST /repos/{name}/upload
         # params: message, file
         
-        with open(tf.name, 'rb') as f:
-            files = {'file': ('archive.zip', f, 'application/zip')}
-            data = {'message': "Push from CLI"}
-            
-            # authenticated_request uses requests.Session() which maintains method signatures
-            # We need to construct URL
-            # authenticared_request prefixes API_BASE_URL.
-            # remote might include full URL. 
-            # API_BASE_URL: http://localhost:8001
-            # remote: http://localhost:8001/repos/name
-            # If we extract path: /repos/name
-            
-            from urllib.parse import urlparse
-            path = urlparse(remote).path
-            
-            res = authenticated_request("POST", f"{path}/upload", data=data, files=files)
-            
-            if res.status_code == 200:
-                print(f"Push successful. Remote snapshot: {res.json().get('snapshot_id')}")
-            else:
-                print(f"Push failed: {res.text}")
-    finally:
-        os.remove(tf.name)
+        files = {'file': ('archive.zip', buf, 'application/zip')}
+        data = {'message': "Push from CLI"}
+        
+        # authenticated_request uses requests.Session() which maintains method signatures
+        # We need to construct URL
+        # authenticared_request prefixes API_BASE_URL.
+        # remote might include full URL. 
+        # API_BASE_URL: http://localhost:8001
+        # remote: http://localhost:8001/repos/name
+        # If we extract path: /repos/name
+        
+        from urllib.parse import urlparse
+        path = urlparse(remote).path
+        
+        res = authenticated_request("POST", f"{path}/upload", data=data, files=files)
+        
+        if res.status_code == 200:
+            print(f"Push successful. Remote snapshot: {res.json().get('snapshot_id')}")
+        else:
+            print(f"Push failed: {res.text}")
 
 def pull():
+    from .api import authenticated_request
     root = find_root()
     if not root:
         print("fatal: not a anchor repository")
         return
 
     # Get remote
-    config_path = os.path.join(root, ANCHOR_DIR, CONFIG_FILE)
-    with open(config_path) as f:
-        config = json.load(f)
+    config = _load_config(root)
     remote = config.get("remote")
     if not remote:
         print("fatal: no remote configured")
@@ -488,23 +925,27 @@ def pull():
     print(f"Pulling from {remote}...")
     
     # Archive download
-    res = authenticated_request("GET", f"/repos/{repo_name}/archive")
+    # The archive is already compressed; don't ask for it to be gzipped again
+    res = authenticated_request(
+        "GET", f"/repos/{repo_name}/archive", stream=True, headers={"Accept-Encoding": "identity"}
+    )
     if res.status_code != 200:
         print(f"Pull failed: {res.status_code}")
+        res.close()
         return
         
     # Unzip over
     try:
-        with zipfile.ZipFile(io.BytesIO(res.content)) as zf:
-            zf.extractall(root)
+        with _download_archive(res) as spool, zipfile.ZipFile(spool) as zf:
+            _extract_zip(zf, root)
         print("Pull successful.")
     except Exception as e:
         print(f"Error extracting pull: {e}")
 
 def _save_config(root, config):
     config_path = os.path.join(root, ANCHOR_DIR, CONFIG_FILE)
-    with open(config_path, "w") as f:
-        json.dump(config, f, indent=2)
+    _atomic_write(config_path, _dumps(config, indent=True))
+    _read_config.cache_clear()
 
 def config(key=None, value=None, list_flag=False):
     if list_flag:
@@ -570,36 +1011,32 @@ def log(oneline=False):
         return
         
     # We need to traverse HEAD -> parent -> parent
-    head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-    if not os.path.exists(head_path):
-        print("fatal: HEAD not found")
-        return
-        
-    with open(head_path) as f:
-        ref = f.read().strip()
-        
-    # If ref is symlink to refs/heads/main
-    current_commit_id = None
-    if ref.startswith("refs/"):
-        ref_path = os.path.join(root, ANCHOR_DIR, ref)
-        if os.path.exists(ref_path):
-            with open(ref_path) as f:
-                current_commit_id = f.read().strip()
-    else:
-        current_commit_id = ref # detached head?
+    _, current_commit_id = resolve_head(root)
         
     if not current_commit_id:
         print("No commits yet.")
         return
         
+    # List the snapshots directory once instead of probing it per commit
+    snapshots_dir = os.path.join(root, ANCHOR_DIR, "objects", "snapshots")
+    try:
+        with os.scandir(snapshots_dir) as it:
+            snap_paths = {}
+            for e in it:
+                name, ext = os.path.splitext(e.name)
+                # msgpack wins over a legacy JSON copy of the same snapshot
+                if ext == ".mp" or (ext == ".json" and name not in snap_paths):
+                    snap_paths[name] = e.path
+    except FileNotFoundError:
+        snap_paths = {}
+        
     while current_commit_id:
         # Load snapshot object
-        snap_path = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{current_commit_id}.json")
-        if not os.path.exists(snap_path):
+        snap_path = snap_paths.get(current_commit_id)
+        if snap_path is None:
             break
             
-        with open(snap_path) as f:
-            snap = json.load(f)
+        snap = _read_object_file(snap_path)
             
         if oneline:
             print(f"{current_commit_id[:7]} {snap.get('message')}")
@@ -651,16 +1088,7 @@ def reset(target=None, hard=False, soft=False, path=None):
     # Resolve ref -> commit
     cid = None
     if ref_arg == "HEAD":
-        head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-        if os.path.exists(head_path):
-            with open(head_path) as f:
-                 ref = f.read().strip()
-            if ref.startswith("refs/"):
-                rp = os.path.join(root, ANCHOR_DIR, ref)
-                if os.path.exists(rp):
-                    with open(rp) as f: cid = f.read().strip()
-            else:
-                cid = ref
+        _, cid = resolve_head(root)
     else:
         # Try as branch or hash
         bp = os.path.join(root, ANCHOR_DIR, "refs", "heads", ref_arg)
@@ -671,9 +1099,9 @@ def reset(target=None, hard=False, soft=False, path=None):
             
     # Traverse parents for tilde
     while tilde_count > 0 and cid:
-        sp = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{cid}.json")
-        if os.path.exists(sp):
-            with open(sp) as f: cid = json.load(f).get("parent")
+        snap = _load_snapshot(root, cid)
+        if snap is not None:
+            cid = snap.get("parent")
         tilde_count -= 1
         
     if not cid:
@@ -683,12 +1111,11 @@ def reset(target=None, hard=False, soft=False, path=None):
     if target_path:
         # Mixed reset path to state in cid
         # Load cid tree
-        sp = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{cid}.json")
-        if not os.path.exists(sp): return
-        with open(sp) as f: tree_id = json.load(f).get("root_tree")
-        
-        tp = os.path.join(root, ANCHOR_DIR, "objects", "trees", f"{tree_id}.json")
-        with open(tp) as f: entries = json.load(f).get("entries", {})
+        snap = _load_snapshot(root, cid)
+        if snap is None: return
+        tree = _load_tree(root, snap.get("root_tree"))
+        if tree is None: return
+        entries = tree.get("entries", {})
         
         rel = os.path.relpath(os.path.abspath(target_path), root)
         if rel in entries:
@@ -703,27 +1130,22 @@ def reset(target=None, hard=False, soft=False, path=None):
         
     # Reset HEAD to cid
     # Update ref
-    head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-    with open(head_path) as f:
-        head_ref = f.read().strip()
-        
-    if head_ref.startswith("refs/"):
-        rp = os.path.join(root, ANCHOR_DIR, head_ref)
-        with open(rp, "w") as f: f.write(cid)
+    head_ref, _ = resolve_head(root)
+    if head_ref:
+        _atomic_write(os.path.join(root, ANCHOR_DIR, head_ref), cid)
     else:
-        with open(head_path, "w") as f: f.write(cid)
+        _atomic_write(os.path.join(root, ANCHOR_DIR, "HEAD"), cid)
         
     if soft:
         # Done
         return
         
     # Mixed or Hard: Update index
-    sp = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{cid}.json")
-    if not os.path.exists(sp): return
-    with open(sp) as f: tree_id = json.load(f).get("root_tree")
-    
-    tp = os.path.join(root, ANCHOR_DIR, "objects", "trees", f"{tree_id}.json")
-    with open(tp) as f: entries = json.load(f).get("entries", {})
+    snap = _load_snapshot(root, cid)
+    if snap is None: return
+    tree = _load_tree(root, snap.get("root_tree"))
+    if tree is None: return
+    entries = tree.get("entries", {})
     
     new_index = {}
     for p, m in entries.items():
@@ -737,16 +1159,33 @@ def reset(target=None, hard=False, soft=False, path=None):
              if bp and os.path.exists(bp):
                  dest = os.path.join(root, path)
                  os.makedirs(os.path.dirname(dest), exist_ok=True)
-                 shutil.copy(bp, dest)
+                 _materialize_blob(bp, dest)
                  
     if not hard:
         print(f"Unstaged changes after reset.")
     else:
         print(f"HEAD is now at {cid[:7]}")
 
+def _blob_base(root, blob_hash):
+    return os.path.join(root, ANCHOR_DIR, "objects", "blobs", blob_hash[:2], blob_hash[2:4], blob_hash)
+
 def _get_blob_path(root, blob_hash):
     if not blob_hash: return None
-    return os.path.join(root, ANCHOR_DIR, "objects", "blobs", blob_hash[:2], blob_hash[2:4], f"{blob_hash}.blob")
+    base = _blob_base(root, blob_hash)
+    if os.path.exists(base + ZSTD_BLOB_SUFFIX):
+        return base + ZSTD_BLOB_SUFFIX
+    return base + ".blob"
+
+def _read_blob_lines(root, blob_hash):
+    """Lines of a blob as text, with undecodable bytes replaced; [] if missing"""
+    bp = _get_blob_path(root, blob_hash)
+    if not bp or not os.path.exists(bp):
+        return []
+    try:
+        with _open_blob_text(bp, encoding="utf-8", errors="replace") as f:
+            return f.readlines()
+    except FileNotFoundError:
+        return []
 
 def diff(staged=False):
     import difflib
@@ -765,115 +1204,81 @@ def diff(staged=False):
     if staged:
         # Compare index vs HEAD
         # Need to load HEAD tree
-        head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-        if not os.path.exists(head_path):
-            return
-        with open(head_path) as f:
-            ref = f.read().strip()
-        
-        # Resolve ref
-        if ref.startswith("refs/"):
-            ref_path = os.path.join(root, ANCHOR_DIR, ref)
-            if os.path.exists(ref_path):
-                with open(ref_path) as f:
-                    commit_id = f.read().strip()
-            else:
-                commit_id = None
-        else:
-            commit_id = ref
+        _, commit_id = resolve_head(root)
             
         if not commit_id:
             return
 
         # Load commit -> tree
-        snap_path = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{commit_id}.json")
-        if not os.path.exists(snap_path):
+        snap = _load_snapshot(root, commit_id)
+        if snap is None:
             return
-        with open(snap_path) as f:
-            snap = json.load(f)
         
-        tree_id = snap.get("root_tree")
         # Load tree entries
-        tree_path = os.path.join(root, ANCHOR_DIR, "objects", "trees", f"{tree_id}.json")
-        if not os.path.exists(tree_path):
+        tree_obj = _load_tree(root, snap.get("root_tree"))
+        if tree_obj is None:
             return
-        with open(tree_path) as f:
-            tree_obj = json.load(f)
             
         params = tree_obj.get("entries", {})
         
         # Identify modified/added/deleted in index vs params
         all_paths = set(index.keys()) | set(params.keys())
-        
+        changed = []
         for path in sorted(all_paths):
             index_hash = index.get(path)
             head_hash = params.get(path, {}).get("id")
-            
             if index_hash != head_hash:
-                diffs_found = True
-                print(f"diff --git a/{path} b/{path}")
-                if not head_hash:
-                    print(f"new file mode 100644")
-                elif not index_hash:
-                    print(f"deleted file mode 100644")
-                
-                # Fetch content
-                a_lines = []
-                b_lines = []
-                
-                if head_hash:
-                    bp = _get_blob_path(root, head_hash)
-                    if bp and os.path.exists(bp):
-                        try:
-                            with open(bp, "r", encoding="utf-8", errors="replace") as f:
-                                a_lines = f.readlines()
-                        except: pass
-                
-                if index_hash:
-                    bp = _get_blob_path(root, index_hash)
-                    if bp and os.path.exists(bp):
-                        try:
-                            with open(bp, "r", encoding="utf-8", errors="replace") as f:
-                                b_lines = f.readlines()
-                        except: pass
-                        
-                for line in difflib.unified_diff(a_lines, b_lines, fromfile=f"a/{path}", tofile=f"b/{path}"):
-                    print(line, end="")
+                changed.append((path, head_hash, index_hash))
+        
+        # Load both sides of every changed path concurrently
+        needed = list({h for _, head_hash, index_hash in changed for h in (head_hash, index_hash) if h})
+        blob_lines = {}
+        if needed:
+            workers = min(32, (os.cpu_count() or 1) * 2, len(needed))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                blob_lines = dict(zip(needed, executor.map(lambda h: _read_blob_lines(root, h), needed)))
+        
+        for path, head_hash, index_hash in changed:
+            diffs_found = True
+            print(f"diff --git a/{path} b/{path}")
+            if not head_hash:
+                print(f"new file mode 100644")
+            elif not index_hash:
+                print(f"deleted file mode 100644")
+            
+            a_lines = blob_lines.get(head_hash, [])
+            b_lines = blob_lines.get(index_hash, [])
+            for line in difflib.unified_diff(a_lines, b_lines, fromfile=f"a/{path}", tofile=f"b/{path}"):
+                print(line, end="")
     else:
         # Compare working directory vs index
         # Walk and compare
-        for r, d, f in os.walk(root):
-            if ".anchor" in d: d.remove(".anchor")
-            for file in f:
-                full_path = os.path.join(r, file)
-                rel_path = os.path.relpath(full_path, root)
+        tracked = [
+            (rel_path, full_path, st)
+            for full_path, rel_path, st in _iter_worktree(root)
+            if rel_path in index
+        ]
+        hashes = _hash_worktree_files(root, tracked)
+        
+        for (rel_path, full_path, _), current_hash in zip(tracked, hashes):
+            # Check consistency
+            index_hash = index[rel_path]
+            
+            if current_hash != index_hash:
+                diffs_found = True
+                print(f"diff --git a/{rel_path} b/{rel_path}")
+                # Load index content
+                b_lines = []
                 
-                if rel_path in index:
-                    # Check consistency
-                    current_hash = _hash_file(full_path)
-                    index_hash = index[rel_path]
+                a_lines = _read_blob_lines(root, index_hash)
                     
-                    if current_hash != index_hash:
-                        diffs_found = True
-                        print(f"diff --git a/{rel_path} b/{rel_path}")
-                        # Load index content
-                        a_lines = []
-                        b_lines = []
-                        
-                        bp = _get_blob_path(root, index_hash)
-                        if bp and os.path.exists(bp):
-                            try:
-                                with open(bp, "r", encoding="utf-8", errors="replace") as fobj:
-                                    a_lines = fobj.readlines()
-                            except: pass
-                            
-                        try:
-                            with open(full_path, "r", encoding="utf-8", errors="replace") as fobj:
-                                b_lines = fobj.readlines()
-                        except: pass
-                        
-                        for line in difflib.unified_diff(a_lines, b_lines, fromfile=f"a/{rel_path}", tofile=f"b/{rel_path}"):
-                            print(line, end="")
+                try:
+                    with open(full_path, "r", encoding="utf-8", errors="replace") as fobj:
+                        b_lines = fobj.readlines()
+                except: pass
+                
+                for line in difflib.unified_diff(a_lines, b_lines, fromfile=f"a/{rel_path}", tofile=f"b/{rel_path}"):
+                    print(line, end="")
 
 def checkout(arg, b_flag=False):
     root = find_root()
@@ -893,36 +1298,17 @@ def checkout(arg, b_flag=False):
             return
             
         head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-        if not os.path.exists(head_path):
-            # Checking out orphan branch logic? Or error?
-            # If no commits yet, we can switch HEAD to refs/heads/branch_name (unborn branch)
-            pass
-        
-        current_ref = None
-        if os.path.exists(head_path):
-             with open(head_path) as f:
-                 current_ref = f.read().strip()
-                 
-        start_point = None
-        if current_ref:
-            if current_ref.startswith("refs/"):
-                ref_p = os.path.join(root, ANCHOR_DIR, current_ref)
-                if os.path.exists(ref_p):
-                    with open(ref_p) as f:
-                        start_point = f.read().strip()
-            else:
-                start_point = current_ref
+        # If no commits yet, HEAD just moves to the unborn branch
+        _, start_point = resolve_head(root)
         
         # Create new ref
         new_ref_path = os.path.join(root, ANCHOR_DIR, "refs", "heads", branch_name)
         os.makedirs(os.path.dirname(new_ref_path), exist_ok=True)
         if start_point:
-            with open(new_ref_path, "w") as f:
-                f.write(start_point)
+            _atomic_write(new_ref_path, start_point)
                 
         # Switch HEAD
-        with open(head_path, "w") as f:
-            f.write(f"refs/heads/{branch_name}")
+        _atomic_write(head_path, f"refs/heads/{branch_name}")
             
         print(f"Switched to a new branch '{branch_name}'")
         
@@ -934,8 +1320,7 @@ def checkout(arg, b_flag=False):
         if os.path.exists(branch_path):
             # Switch branch
             head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-            with open(head_path, "w") as f:
-                f.write(f"refs/heads/{arg}")
+            _atomic_write(head_path, f"refs/heads/{arg}")
             print(f"Switched to branch '{arg}'")
             # NOTE: Ideally we should update the working directory (checkout files).
             # But that's complex (need to remove tracked files, restore new ones).
@@ -951,7 +1336,7 @@ def checkout(arg, b_flag=False):
                 blob_hash = index[rel_path]
                 bp = _get_blob_path(root, blob_hash)
                 if bp and os.path.exists(bp):
-                    shutil.copy(bp, path)
+                    _materialize_blob(bp, path)
                     print(f"Updated {path} from index.")
                 else:
                     print(f"fatal: blob {blob_hash} missing")
@@ -972,13 +1357,10 @@ def branch(name=None, delete=False):
         bp = os.path.join(root, ANCHOR_DIR, "refs", "heads", name)
         if os.path.exists(bp):
             # Check if checked out
-            head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-            if os.path.exists(head_path):
-                with open(head_path) as f:
-                    ref = f.read().strip()
-                if ref == f"refs/heads/{name}":
-                    print(f"error: Cannot delete checked-out branch '{name}'")
-                    return
+            ref, _ = resolve_head(root)
+            if ref == f"refs/heads/{name}":
+                print(f"error: Cannot delete checked-out branch '{name}'")
+                return
             
             os.remove(bp)
             print(f"Deleted branch {name}")
@@ -990,67 +1372,62 @@ def branch(name=None, delete=False):
         # Create branch
         # anchor branch <name>
         # Duplicate current HEAD
-        head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-        current_commit = None
-        if os.path.exists(head_path):
-            with open(head_path) as f:
-                ref = f.read().strip()
-                if ref.startswith("refs/"):
-                    rp = os.path.join(root, ANCHOR_DIR, ref)
-                    if os.path.exists(rp):
-                        with open(rp) as rf:
-                            current_commit = rf.read().strip()
-                else:
-                    current_commit = ref
+        _, current_commit = resolve_head(root)
                     
         if current_commit:
             bp = os.path.join(root, ANCHOR_DIR, "refs", "heads", name)
             os.makedirs(os.path.dirname(bp), exist_ok=True)
-            with open(bp, "w") as f:
-                f.write(current_commit)
+            _atomic_write(bp, current_commit)
             print(f"Created branch {name}")
         else:
             print("fatal: not a valid object name: 'HEAD'")
     else:
         # List branches
         heads_dir = os.path.join(root, ANCHOR_DIR, "refs", "heads")
-        if os.path.exists(heads_dir):
+        if os.path.isdir(heads_dir):
             # Get current branch
-            head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
+            ref, _ = resolve_head(root)
             current = ""
-            if os.path.exists(head_path):
-                with open(head_path) as f:
-                    ref = f.read().strip()
-                    if ref.startswith("refs/heads/"):
-                        current = ref.replace("refs/heads/", "")
+            if ref and ref.startswith("refs/heads/"):
+                current = ref.replace("refs/heads/", "")
                         
-            for b in os.listdir(heads_dir):
+            for b in _list_refs(heads_dir):
                 prefix = "* " if b == current else "  "
                 print(f"{prefix}{b}")
 
+def _list_refs(ref_dir, prefix=""):
+    """Sorted ref names under ref_dir, descending into nested refs like feature/x"""
+    names = []
+    with os.scandir(ref_dir) as it:
+        for entry in it:
+            if entry.is_dir():
+                names.extend(_list_refs(entry.path, f"{prefix}{entry.name}/"))
+            elif entry.is_file():
+                names.append(prefix + entry.name)
+    return sorted(names)
+
 def clean_cmd(dry_run=False):
     root = find_root()
     if not root:
         print("fatal: not a anchor repository")
         return
         
-    index = _load_index(root)
+    # Only membership is needed, not the blob hashes
+    tracked = frozenset(_load_index(root))
     
-    # Walk and check untracked
-    for r, d, f in os.walk(root):
-        if ".anchor" in d: d.remove(".anchor")
-        if ".git" in d: d.remove(".git")
-        
-        for file in f:
-            full_path = os.path.join(r, file)
-            rel_path = os.path.relpath(full_path, root)
-            
-            if rel_path not in index:
-                if dry_run:
-                    print(f"Would remove {rel_path}")
-                else:
-                    os.remove(full_path)
-                    print(f"Removing {rel_path}")
+    # Walk and check untracked; file types come from the directory
+    # listing, so no per-file stat is needed
+    untracked = [
+        (full_path, rel_path)
+        for full_path, rel_path, _ in _iter_worktree(root, with_stat=False)
+        if rel_path not in tracked
+    ]
+    for full_path, rel_path in untracked:
+        if dry_run:
+            print(f"Would remove {rel_path}")
+        else:
+            os.remove(full_path)
+            print(f"Removing {rel_path}")
 
 def show(arg="HEAD"):
     root = find_root()
@@ -1060,17 +1437,7 @@ def show(arg="HEAD"):
     # Resolve arg to commit_id
     commit_id = None
     if arg == "HEAD":
-        head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-        if os.path.exists(head_path):
-            with open(head_path) as f:
-                ref = f.read().strip()
-            if ref.startswith("refs/"):
-                rp = os.path.join(root, ANCHOR_DIR, ref)
-                if os.path.exists(rp):
-                    with open(rp) as f:
-                        commit_id = f.read().strip()
-            else:
-                commit_id = ref
+        _, commit_id = resolve_head(root)
     else:
         # Assume arg is hash or ref
         commit_id = arg # TODO: resolve refs/heads/arg
@@ -1080,13 +1447,10 @@ def show(arg="HEAD"):
         return
         
     # Load snapshot
-    snap_path = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{commit_id}.json")
-    if not os.path.exists(snap_path):
+    snap = _load_snapshot(root, commit_id)
+    if snap is None:
          print(f"fatal: bad object {commit_id}")
          return
-         
-    with open(snap_path) as f:
-        snap = json.load(f)
         
     print(f"commit {commit_id}")
     print(f"Date:   {snap.get('timestamp')}")
@@ -1096,33 +1460,19 @@ def show(arg="HEAD"):
     parent = snap.get("parent")
     if parent:
         # Load parent tree
-        p_snap_path = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{parent}.json")
-        if os.path.exists(p_snap_path):
-            with open(p_snap_path) as f:
-                p_snap = json.load(f)
-            p_tree = p_snap.get("root_tree")
-        else:
-            p_tree = None
+        p_snap = _load_snapshot(root, parent)
+        p_tree = p_snap.get("root_tree") if p_snap is not None else None
     else:
         p_tree = None
         
     c_tree = snap.get("root_tree")
+    if p_tree == c_tree:
+        return
     
     # Compare p_tree vs c_tree
     # Load trees
-    p_entries = {}
-    if p_tree:
-        tp = os.path.join(root, ANCHOR_DIR, "objects", "trees", f"{p_tree}.json")
-        if os.path.exists(tp):
-            with open(tp) as f:
-                p_entries = json.load(f).get("entries", {})
-                
-    c_entries = {}
-    if c_tree:
-        tp = os.path.join(root, ANCHOR_DIR, "objects", "trees", f"{c_tree}.json")
-        if os.path.exists(tp):
-            with open(tp) as f:
-                c_entries = json.load(f).get("entries", {})
+    p_entries = (_load_tree(root, p_tree) or {}).get("entries", {})
+    c_entries = (_load_tree(root, c_tree) or {}).get("entries", {})
                 
     import difflib
     all_paths = set(p_entries.keys()) | set(c_entries.keys())
@@ -1133,24 +1483,36 @@ def show(arg="HEAD"):
         
         if p_hash != c_hash:
             print(f"diff --git a/{path} b/{path}")
-            a_lines = []
-            b_lines = []
+            a_bytes = b""
+            b_bytes = b""
             
             if p_hash:
-                bp = _get_blob_path(root, p_hash)
-                if bp and os.path.exists(bp):
-                    try:
-                        with open(bp, "r") as f: a_lines = f.readlines()
-                    except: pass
+                try:
+                    with _open_blob(_get_blob_path(root, p_hash)) as f: a_bytes = f.read()
+                except FileNotFoundError: pass
             if c_hash:
-                bp = _get_blob_path(root, c_hash)
-                if bp and os.path.exists(bp):
-                    try:
-                        with open(bp, "r") as f: b_lines = f.readlines()
-                    except: pass
-                    
-            for line in difflib.unified_diff(a_lines, b_lines, fromfile=f"a/{path}", tofile=f"b/{path}"):
-                print(line, end="")
+                try:
+                    with _open_blob(_get_blob_path(root, c_hash)) as f: b_bytes = f.read()
+                except FileNotFoundError: pass
+            
+            if b"\0" in a_bytes or b"\0" in b_bytes:
+                print(f"Binary files a/{path} and b/{path} differ")
+                continue
+            
+            out = b"".join(difflib.diff_bytes(
+                difflib.unified_diff,
+                a_bytes.splitlines(keepends=True),
+                b_bytes.splitlines(keepends=True),
+                fromfile=f"a/{path}".encode(),
+                tofile=f"b/{path}".encode(),
+            ))
+            buffer = getattr(sys.stdout, "buffer", None)
+            if buffer is None:
+                # Text-only stdout (e.g. a StringIO in tests)
+                sys.stdout.write(out.decode("utf-8", "replace"))
+            else:
+                sys.stdout.flush()
+                buffer.write(out)
 
 def merge(branch_name):
     root = find_root()
@@ -1158,82 +1520,76 @@ def merge(branch_name):
         return
         
     # Get current head
-    head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-    with open(head_path) as f:
-        head_ref = f.read().strip()
+    head_ref, current_commit = resolve_head(root)
         
     # Get target branch commit
     target_ref_path = os.path.join(root, ANCHOR_DIR, "refs", "heads", branch_name)
-    if not os.path.exists(target_ref_path):
+    try:
+        with open(target_ref_path) as f:
+            target_commit = f.read().strip()
+    except FileNotFoundError:
         print(f"merge: {branch_name} - not something we can merge")
         return
-    with open(target_ref_path) as f:
-        target_commit = f.read().strip()
         
     # Check if we are already there
     # Check if ancestor
     # Walk down target_commit list until we find current HEAD (fast-forward)
     
-    # Get current commit
-    current_commit = None
-    if head_ref.startswith("refs/"):
-        rp = os.path.join(root, ANCHOR_DIR, head_ref)
-        if os.path.exists(rp):
-             with open(rp) as f: current_commit = f.read().strip()
-    else:
-        current_commit = head_ref
-        
     if current_commit == target_commit:
         print("Already up to date.")
         return
         
     # Simple check for FF: Is current_commit in target_commit's history?
-    # We walk target_commit's parents.
+    # Collect target_commit's ancestors; the set also stops a parent cycle.
     
+    ancestors = set()
     walker = target_commit
-    is_ancestor = False
-    limit = 1000 # safeguard
-    while walker and limit > 0:
+    while walker and walker not in ancestors:
+        ancestors.add(walker)
         if walker == current_commit:
-            is_ancestor = True
             break
-        # Load walker snap
-        sp = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{walker}.json")
-        if not os.path.exists(sp):
-            break
-        with open(sp) as f:
-             walker = json.load(f).get("parent")
-        limit -= 1
+        snap = _load_snapshot(root, walker)
+        walker = snap.get("parent") if snap is not None else None
         
-    if is_ancestor:
+    if current_commit in ancestors:
         print("Updating (Fast-forward)")
         # Update HEAD ref
-        if head_ref.startswith("refs/"):
-            rp = os.path.join(root, ANCHOR_DIR, head_ref)
-            with open(rp, "w") as f:
-                f.write(target_commit)
+        if head_ref:
+            _atomic_write(os.path.join(root, ANCHOR_DIR, head_ref), target_commit)
         else:
-             with open(head_path, "w") as f:
-                 f.write(target_commit)
+            _atomic_write(os.path.join(root, ANCHOR_DIR, "HEAD"), target_commit)
                  
         # Checkout files from target_commit tree
         # Load target tree
-        sp = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{target_commit}.json")
-        with open(sp) as f:
-             tree_id = json.load(f).get("root_tree")
+        snap = _load_snapshot(root, target_commit)
+        tree = _load_tree(root, snap.get("root_tree")) if snap is not None else None
+        if tree is None:
+            print(f"fatal: missing tree for {target_commit}")
+            return
+        entries = tree.get("entries", {})
         
-        tp = os.path.join(root, ANCHOR_DIR, "objects", "trees", f"{tree_id}.json")
-        with open(tp) as f:
-             entries = json.load(f).get("entries", {})
+        # Paths whose blob is the same in the current tree are left alone
+        cur_snap = _load_snapshot(root, current_commit) if current_commit else None
+        cur_entries = {}
+        if cur_snap is not None:
+            cur_entries = (_load_tree(root, cur_snap.get("root_tree")) or {}).get("entries", {})
              
         # Update files
+        writes = []
         for path, meta in entries.items():
             blob_hash = meta.get("id")
+            dest = os.path.join(root, path)
+            if cur_entries.get(path, {}).get("id") == blob_hash and os.path.exists(dest):
+                continue
             bp = _get_blob_path(root, blob_hash)
             if bp and os.path.exists(bp):
-                dest = os.path.join(root, path)
-                os.makedirs(os.path.dirname(dest), exist_ok=True)
-                shutil.copy(bp, dest)
+                writes.append((bp, dest))
+        
+        # Create each parent directory once rather than once per file
+        for d in sorted({os.path.dirname(dest) for _, dest in writes}, key=len):
+            os.makedirs(d, exist_ok=True)
+        for bp, dest in writes:
+            _materialize_blob(bp, dest)
                 
         # Update index
         # We should update index to match the merged tree
@@ -1255,18 +1611,36 @@ def _log_ref_update(root, ref, old_sha, new_sha, message):
     with open(log_path, "a") as f:
         f.write(entry)
 
+def _tail_lines(f, block=8192):
+    """Yield the lines of a binary file last to first, reading it backwards in blocks"""
+    pos = f.seek(0, os.SEEK_END)
+    rest = b""
+    while pos > 0:
+        step = min(block, pos)
+        pos -= step
+        f.seek(pos)
+        chunk = f.read(step) + rest
+        lines = chunk.split(b"\n")
+        rest = lines.pop(0)
+        for line in reversed(lines):
+            if line:
+                yield line.decode()
+    if rest:
+        yield rest.decode()
+
 def reflog():
     root = find_root()
     if not root: return
     
     log_path = os.path.join(root, ANCHOR_DIR, "logs", "HEAD")
-    if not os.path.exists(log_path):
+    try:
+        f = open(log_path, "rb")
+    except FileNotFoundError:
         return
         
-    with open(log_path) as f:
-        # Show in reverse
-        lines = f.readlines()
-        for line in reversed(lines):
+    # Newest entries first
+    with f:
+        for line in _tail_lines(f):
             parts = line.strip().split("\t")
             if len(parts) >= 2:
                 meta = parts[0].split(" ")
@@ -1289,6 +1663,7 @@ def restore(arg):
     checkout(arg)
 
 def fetch(remote_name="origin"):
+    from .api import authenticated_request
     root = find_root()
     if not root: return
     
@@ -1304,17 +1679,31 @@ def fetch(remote_name="origin"):
     print(f"Fetching {remote_name}...")
     hist_res = authenticated_request("GET", f"/repos/{repo_name}/history")
     if hist_res.status_code == 200:
-        history = hist_res.json()
-        new_objects = 0
+        history = _loads(hist_res.content)
+        snapshots_dir = os.path.join(root, ANCHOR_DIR, "objects", "snapshots")
+        os.makedirs(snapshots_dir, exist_ok=True)
+        # List the snapshots directory once instead of probing it per snapshot;
+        # either format counts as present
+        with os.scandir(snapshots_dir) as it:
+            present = {os.path.splitext(e.name)[0] for e in it if e.name.endswith((".mp", ".json"))}
+        written = []
         for snap in history:
             sid = snap.get("snapshot_id")
-            if sid:
-                snap_path = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{sid}.json")
-                if not os.path.exists(snap_path):
-                    os.makedirs(os.path.dirname(snap_path), exist_ok=True)
-                    with open(snap_path, "w") as f:
-                        json.dump(snap, f, indent=2)
-                    new_objects += 1
+            if sid and sid not in present:
+                present.add(sid)
+                ext, data = _encode_object(snap)
+                snap_path = os.path.join(snapshots_dir, sid + ext)
+                # Rename into place so a reader never sees a partial object;
+                # a concurrent fetch writing the same id writes the same bytes
+                tmp = f"{snap_path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, snap_path)
+                written.append(snap_path)
+        if written:
+            _load_snapshot.cache_clear()
+            # Make the whole batch durable once, before the ref can point at it
+            _sync_batch(written, snapshots_dir)
                     
         # Update remote ref
         if history:
@@ -1326,12 +1715,13 @@ def fetch(remote_name="origin"):
             
             # Check old
             old_sha = "0000000"
-            if os.path.exists(ref_path):
+            try:
                 with open(ref_path) as f: old_sha = f.read().strip()
+            except FileNotFoundError:
+                pass
             
             if old_sha != latest:
-                with open(ref_path, "w") as f:
-                    f.write(latest)
+                _atomic_write(ref_path, latest)
                 _log_ref_update(root, "HEAD", old_sha, latest, f"fetch {remote_name}")
                 print(f"   {old_sha[:7]}..{latest[:7]}  main -> {remote_name}/main")
             else:
@@ -1349,31 +1739,15 @@ def blame(path):
          return
          
     # Find last commit altering this path
-    head_path = os.path.join(root, ANCHOR_DIR, "HEAD")
-    with open(head_path) as f: ref = f.read().strip()
-    # Resolve ref
-    cid = ref
-    if ref.startswith("refs/"):
-        rp = os.path.join(root, ANCHOR_DIR, ref)
-        if os.path.exists(rp):
-             with open(rp) as f: cid = f.read().strip()
+    _, cid = resolve_head(root)
              
     original_cid = cid
     last_mod = None
     
+    prefetched = set()
     while cid:
-        sp = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{cid}.json")
-        if not os.path.exists(sp): break
-        with open(sp) as f: snap = json.load(f)
-        
-        # Check tree for file hash
-        tree_id = snap.get("root_tree")
-        tp = os.path.join(root, ANCHOR_DIR, "objects", "trees", f"{tree_id}.json")
-        entries = {}
-        if os.path.exists(tp):
-             with open(tp) as f: entries = json.load(f).get("entries", {})
-             
-        curr_hash = entries.get(rel, {}).get("id")
+        snap = _load_snapshot(root, cid)
+        if snap is None: break
         
         # Check parent
         parent = snap.get("parent")
@@ -1381,14 +1755,20 @@ def blame(path):
             last_mod = cid # First commit
             break
             
-        psp = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{parent}.json")
+        psnap = _load_snapshot(root, parent)
+        if psnap is not None and psnap.get("root_tree") == snap.get("root_tree"):
+            # Same tree, so the file cannot have changed here
+            cid = parent
+            continue
+        
+        # Check tree for file hash
+        entries = (_load_tree(root, snap.get("root_tree")) or {}).get("entries", {})
+             
+        curr_hash = entries.get(rel, {}).get("id")
+        
         p_entries = {}
-        if os.path.exists(psp):
-             with open(psp) as f: psnap = json.load(f)
-             ptree = psnap.get("root_tree")
-             ptp = os.path.join(root, ANCHOR_DIR, "objects", "trees", f"{ptree}.json")
-             if os.path.exists(ptp):
-                 with open(ptp) as f: p_entries = json.load(f).get("entries", {})
+        if psnap is not None:
+             p_entries = (_load_tree(root, psnap.get("root_tree")) or {}).get("entries", {})
                  
         prev_hash = p_entries.get(rel, {}).get("id")
         
@@ -1396,13 +1776,16 @@ def blame(path):
             last_mod = cid
             break
             
+        # Most files change near HEAD; only once a tree comparison has come
+        # up empty is the walk likely to go deep enough to pay for prefetching
+        if parent not in prefetched:
+            prefetched = _prefetch_ancestors(root, parent)
         cid = parent
         
     if last_mod:
         print(f"Last modified commit: {last_mod}")
         # Show commit details
-        sp = os.path.join(root, ANCHOR_DIR, "objects", "snapshots", f"{last_mod}.json")
-        with open(sp) as f: s = json.load(f)
+        s = _load_snapshot(root, last_mod)
         print(f"Author: You")
         print(f"Date:   {s.get('timestamp')}")
         print(f"Message: {s.get('message')}")
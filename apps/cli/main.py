@@ -1,9 +1,40 @@
 #!/usr/bin/env python3
 import argparse
+import importlib
 import sys
-from .auth import login, ssh_login
-from .repo import list_repos, status as system_status, create as create_repo, favorite
-from .git import init, clone, status as git_status, add, commit, push, pull, log, reset, remote, config, diff, checkout, branch, clean_cmd, show, merge, restore, fetch, gc, blame, reflog
+
+# Command -> (module, function). Only the module for the command being run is
+# imported, so e.g. local git commands never load the crypto stack in .auth.
+HANDLERS = {
+    "login": (".auth", "login"),
+    "ssh-login": (".auth", "ssh_login"),
+    "list": (".repo", "list_repos"),
+    "sys": (".repo", "status"),
+    "create": (".repo", "create"),
+    "favorite": (".repo", "favorite"),
+    "init": (".git", "init"),
+    "clone": (".git", "clone"),
+    "status": (".git", "status"),
+    "add": (".git", "add"),
+    "commit": (".git", "commit"),
+    "push": (".git", "push"),
+    "pull": (".git", "pull"),
+    "log": (".git", "log"),
+    "reset": (".git", "reset"),
+    "remote": (".git", "remote"),
+    "config": (".git", "config"),
+    "diff": (".git", "diff"),
+    "checkout": (".git", "checkout"),
+    "branch": (".git", "branch"),
+    "clean": (".git", "clean_cmd"),
+    "show": (".git", "show"),
+    "merge": (".git", "merge"),
+    "restore": (".git", "restore"),
+    "fetch": (".git", "fetch"),
+    "gc": (".git", "gc"),
+    "blame": (".git", "blame"),
+    "reflog": (".git", "reflog"),
+}
 
 def main():
     parser = argparse.ArgumentParser(description="Anchor CLI")
@@ -19,7 +50,8 @@ def main():
     ssh_parser.add_argument("key_path")
 
     # System
-    subparsers.add_parser("list", help="List repositories")
+    list_parser = subparsers.add_parser("list", help="List repositories")
+    list_parser.add_argument("--details", action="store_true", help="Show visibility, favorite flag and creation time")
     subparsers.add_parser("sys", help="Check system status")
     
     create_parser = subparsers.add_parser("create", help="Create a new repository")
@@ -106,66 +138,57 @@ def main():
     # Dispatch
     args = parser.parse_args()
 
+    if args.command not in HANDLERS:
+        parser.print_help()
+        return
+    module, name = HANDLERS[args.command]
+    handler = getattr(importlib.import_module(module, __package__), name)
+
     if args.command == "login":
-        login(args.username, args.password)
+        handler(args.username, args.password)
     elif args.command == "ssh-login":
-        ssh_login(args.username, args.key_path)
+        handler(args.username, args.key_path)
     elif args.command == "list":
-        list_repos()
-    elif args.command == "sys":
-        system_status()
+        handler(details=args.details)
     elif args.command == "create":
-        create_repo(args.name)
+        handler(args.name)
     elif args.command == "favorite":
-        favorite(args.name, status=not args.off)
-    elif args.command == "init":
-        init()
+        handler(args.name, status=not args.off)
     elif args.command == "clone":
-        clone(args.repo_name, args.destination)
-    elif args.command == "status":
-        git_status()
+        handler(args.repo_name, args.destination)
     elif args.command == "add":
-        add(args.pathspec)
+        handler(args.pathspec)
     elif args.command == "commit":
-        commit(args.message, all_flag=args.all)
-    elif args.command == "push":
-        push()
-    elif args.command == "pull":
-        pull()
+        handler(args.message, all_flag=args.all)
     elif args.command == "log":
-        log(oneline=args.oneline)
+        handler(oneline=args.oneline)
     elif args.command == "reset":
         target = args.args[0] if len(args.args) > 0 else None
         path = args.args[1] if len(args.args) > 1 else None
-        reset(target=target, path=path, hard=args.hard, soft=args.soft)
+        handler(target=target, path=path, hard=args.hard, soft=args.soft)
     elif args.command == "remote":
-        remote(args.subcommand, args.name, args.url, verbose=args.verbose)
+        handler(args.subcommand, args.name, args.url, verbose=args.verbose)
     elif args.command == "config":
-        config(key=args.key, value=args.value, list_flag=args.list)
+        handler(key=args.key, value=args.value, list_flag=args.list)
     elif args.command == "diff":
-        diff(staged=args.staged)
+        handler(staged=args.staged)
     elif args.command == "checkout":
-        checkout(args.arg, b_flag=args.b)
+        handler(args.arg, b_flag=args.b)
     elif args.command == "branch":
-        branch(name=args.name, delete=args.delete)
+        handler(name=args.name, delete=args.delete)
     elif args.command == "clean":
-        clean_cmd(dry_run=args.dry_run)
+        handler(dry_run=args.dry_run)
     elif args.command == "show":
-        show(arg=args.object)
+        handler(arg=args.object)
     elif args.command == "merge":
-        merge(args.branch)
-    elif args.command == "restore":
-        restore(args.path)
+        handler(args.branch)
+    elif args.command in ("restore", "blame"):
+        handler(args.path)
     elif args.command == "fetch":
-        fetch(args.remote)
-    elif args.command == "gc":
-        gc()
-    elif args.command == "blame":
-        blame(args.path)
-    elif args.command == "reflog":
-        reflog()
+        handler(args.remote)
     else:
-        parser.print_help()
+        # sys, init, status, push, pull, gc, reflog take no arguments
+        handler()
 
 if __name__ == "__main__":
     main()
@@ -1,25 +1,60 @@
-import requests
-from .api import authenticated_request, API_BASE_URL
+import getpass
+from collections import namedtuple
+from .api import authenticated_request, get_session, API_BASE_URL
+from .utils import json_loads, post_json, get_pool
 
-def list_repos():
-    res = authenticated_request("GET", "/repos")
-    if res.status_code == 200:
-        repos = res.json()
-        for repo in repos:
-            print(f"- {repo['name']}")
-    else:
-        print(f"Failed to list repos: {res.status_code}")
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# X-Error-Code values the backend sends when an endpoint needs a fresh step-up
+STEP_UP_ERROR_CODES = ("step_up_required", "step_up_expired")
+
+# The fields of /status the CLI reports
+Status = namedtuple("Status", "status uptime version repositories")
+
+def _format_repo(repo):
+    flags = ["public" if repo.get("is_public") else "private"]
+    if repo.get("is_favorite"):
+        flags.append("favorite")
+    if repo.get("created_at"):
+        flags.append(f"created {repo['created_at']}")
+    return f"- {repo['name']} ({', '.join(flags)})"
+
+def list_repos(details=False):
+    # /repos already returns each repo's metadata, so details need no extra requests
+    with authenticated_request("GET", "/repos", stream=ijson is not None) as res:
+        if res.status_code == 200:
+            if ijson is not None:
+                # Print repos as the body arrives instead of building the whole list
+                res.raw.decode_content = True
+                repos = ijson.items(res.raw, "item")
+            else:
+                repos = json_loads(res.content)
+            for repo in repos:
+                print(_format_repo(repo) if details else f"- {repo['name']}")
+        else:
+            print(f"Failed to list repos: {res.status_code}")
+
+def fetch_status():
+    """Return the server's Status, or the HTTP status code on failure"""
+    # No auth involved, so skip the session and its cookie state
+    res = get_pool().request("GET", f"{API_BASE_URL}/status", timeout=5.0)
+    if res.status != 200:
+        return res.status
+    data = json_loads(res.data)
+    return Status(data["status"], data["uptime"], data["version"], data["storage"]["repositories"])
 
 def status():
-    res = requests.get(f"{API_BASE_URL}/status")
-    if res.status_code == 200:
-        data = res.json()
-        print(f"Status: {data['status']}")
-        print(f"Uptime: {data['uptime']}")
-        print(f"Version: {data['version']}")
-        print(f"Repositories: {data['storage']['repositories']}")
+    s = fetch_status()
+    if isinstance(s, Status):
+        print(f"Status: {s.status}")
+        print(f"Uptime: {s.uptime}")
+        print(f"Version: {s.version}")
+        print(f"Repositories: {s.repositories}")
     else:
-        print(f"Failed to get status: {res.status_code}")
+        print(f"Failed to get status: {s}")
 
 def create(name, password_arg=None):
     # This requires step-up, so we might need to prompt password or use existing token if it has permissions?
@@ -28,40 +63,39 @@ def create(name, password_arg=None):
     # 1. Try create.
     # 2. If 403/401 step-up required, prompt password, get step-up token, retry.
     
-    session = requests.Session() # New session or existing? authenticated_request uses transient session.
-    # We need to maintain session for cookies? 
-    # authenticated_request manages cookies.
+    # One session for create, step-up and retry, so they share a connection
+    session = get_session()
     
     # Try with current token
-    res = authenticated_request("POST", "/repos/", json={"name": name})
+    res = authenticated_request("POST", "/repos/", session=session, json={"name": name})
     
-    if res.status_code == 403 or "Step-up authentication required" in res.text:
+    # Servers that predate X-Error-Code only send a bare 403
+    error_code = res.headers.get("X-Error-Code")
+    if error_code in STEP_UP_ERROR_CODES or (error_code is None and res.status_code == 403):
         print("Step-up authentication required to create repository.")
-        from .utils import save_token, load_token
-        from .api import get_session, save_cookies, API_BASE_URL
+        from .utils import load_token
+        from .api import save_cookies
         
         if password_arg:
              password = password_arg
         else:
-             password = input("Password: ")
+             password = getpass.getpass("Password: ")
         
-        session = get_session() # Load cookies
         token = load_token()
         headers = {"Authorization": f"Bearer {token}"}
         
-        su_res = session.post(f"{API_BASE_URL}/auth/step-up", json={"password": password}, headers=headers)
+        su_res = post_json(session, f"{API_BASE_URL}/auth/step-up", {"password": password}, headers=headers)
         if su_res.status_code == 200:
-            su_token = su_res.json()["access_token"]
+            su_token = json_loads(su_res.content)["access_token"]
             # Save this token? It's a short lived step-up token?
             # Or just use it for this request.
             # Usually step-up token replaces access token?
             # The backend `step_up` returns a new access token with `step_up=True`.
-            save_token(su_token)
-            save_cookies(session)
+            save_cookies(session, token=su_token)
             print("Authenticated. Retrying...")
             
             # Retry creation
-            res = authenticated_request("POST", "/repos/", json={"name": name})
+            res = authenticated_request("POST", "/repos/", session=session, json={"name": name})
         else:
             print(f"Step-up failed: {su_res.text}")
             return
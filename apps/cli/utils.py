@@ -1,15 +1,128 @@
 import os
+import json
+import base64
+import functools
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 API_BASE_URL = os.getenv("ANCHOR_API_URL", "http://localhost:8001")
+STATE_FILE = os.path.expanduser("~/.anchor_state.json")
+# Separate token and cookie files used before STATE_FILE; read once to migrate
 TOKEN_FILE = os.path.expanduser("~/.anchor_token")
 COOKIE_FILE = os.path.expanduser("~/.anchor_cookies")
 
+if orjson is not None:
+    def json_loads(data):
+        return orjson.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+else:
+    def json_loads(data):
+        return json.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+def post_json(session, url, payload, **kwargs):
+    """POST payload as a JSON body encoded with json_dumps"""
+    headers = dict(kwargs.pop("headers", None) or {})
+    headers["Content-Type"] = "application/json"
+    return session.post(url, data=json_dumps(payload), headers=headers, **kwargs)
+
+# Plain connection pool for unauthenticated API_BASE_URL endpoints; no session or cookie state
+_pool = None
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        import urllib3
+        import certifi
+        from urllib.parse import urlparse
+        from urllib.request import getproxies, proxy_bypass
+        # Honour the same environment requests does: proxy variables and a CA bundle override
+        ca_certs = os.environ.get("REQUESTS_CA_BUNDLE") or os.environ.get("CURL_CA_BUNDLE") or certifi.where()
+        kwargs = dict(num_pools=2, maxsize=4, retries=urllib3.Retry(1), ca_certs=ca_certs)
+        url = urlparse(API_BASE_URL)
+        proxy = getproxies().get(url.scheme)
+        if proxy and not proxy_bypass(url.hostname or ""):
+            _pool = urllib3.ProxyManager(proxy, **kwargs)
+        else:
+            _pool = urllib3.PoolManager(**kwargs)
+    return _pool
+
+# Token and cookie jar as persisted in STATE_FILE; read once per CLI invocation
+_state: Optional[dict] = None
+
+def _read_legacy_state() -> dict:
+    state = {}
+    try:
+        with open(TOKEN_FILE, "r") as f:
+            state["token"] = f.read().strip()
+    except FileNotFoundError:
+        pass
+    try:
+        with open(COOKIE_FILE, "rb") as f:
+            state["cookies"] = json_loads(f.read())
+    except (FileNotFoundError, ValueError):
+        pass
+    return state
+
+def _write_state(state: dict):
+    # Per-process temp name so concurrent CLI invocations don't share it
+    tmp_path = f"{STATE_FILE}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(json_dumps(state))
+    os.replace(tmp_path, STATE_FILE)
+
+def load_state() -> dict:
+    global _state
+    if _state is None:
+        try:
+            with open(STATE_FILE, "rb") as f:
+                _state = json_loads(f.read())
+        except (FileNotFoundError, ValueError):
+            _state = _read_legacy_state()
+            if _state:
+                # Migrate once: whatever the legacy files held moves to STATE_FILE
+                _write_state(_state)
+                for legacy in (TOKEN_FILE, COOKIE_FILE):
+                    try:
+                        os.remove(legacy)
+                    except FileNotFoundError:
+                        pass
+    return _state
+
+def save_state(**changes):
+    """Apply changes (a None value removes the key) and persist the state with one atomic write"""
+    state = load_state()
+    for key, value in changes.items():
+        if value is None:
+            state.pop(key, None)
+        else:
+            state[key] = value
+    _write_state(state)
+
 def save_token(token: str):
-    with open(TOKEN_FILE, "w") as f:
-        f.write(token)
+    save_state(token=token)
 
 def load_token():
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, "r") as f:
-            return f.read().strip()
-    return None
+    return load_state().get("token")
+
+def clear_token():
+    save_state(token=None)
+
+@functools.lru_cache(maxsize=4)
+def token_exp(token: str) -> Optional[int]:
+    """Read the `exp` claim of a JWT locally (no signature check), or None if unreadable"""
+    try:
+        payload = token.split(".")[1]
+        claims = json_loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return int(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
@@ -6,11 +6,17 @@ API_URL = "http://localhost:8001"
 USERNAME = "admin"
 PASSWORD = "admin"
 
+# One session, so login, 2FA and step-up all ride the same connection
 session = requests.Session()
+session.headers.update({"Connection": "keep-alive", "Content-Type": "application/json"})
+
+# Request bodies are encoded once up front
+login_body = json.dumps({"username": USERNAME, "password": PASSWORD})
+stepup_body = json.dumps({"password": PASSWORD})
 
 # Login
 print("Logging in...")
-res = session.post(f"{API_URL}/auth/login", json={"username": USERNAME, "password": PASSWORD})
+res = session.post(f"{API_URL}/auth/login", data=login_body)
 print(f"Login status: {res.status_code}")
 if res.status_code != 200:
     print(res.text)
@@ -22,7 +28,7 @@ if not token:
     if data.get("status") == "2fa_required":
         print("2FA required. Enter code:")
         code = input()
-        res = session.post(f"{API_URL}/auth/login/2fa", json={"username": USERNAME, "code": code})
+        res = session.post(f"{API_URL}/auth/login/2fa", data=json.dumps({"username": USERNAME, "code": code}))
         print(f"2FA Login status: {res.status_code}")
         data = res.json()
         token = data.get("access_token")
@@ -36,6 +42,6 @@ print("Logged in. Token:", token[:10] + "...")
 # Step-up
 print("Calling step-up...")
 headers = {"Authorization": f"Bearer {token}"}
-res = session.post(f"{API_URL}/auth/step-up", json={"password": PASSWORD}, headers=headers)
+res = session.post(f"{API_URL}/auth/step-up", data=stepup_body, headers=headers)
 print(f"Step-up status: {res.status_code}")
 print(res.text)
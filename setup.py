@@ -31,7 +31,13 @@ setup(
         "requests>=2.25.0",
         "cryptography>=3.4.0",
         "pyotp>=2.6.0",
+        "msgpack>=1.0",
+        "zstandard>=0.15",
     ],
+    extras_require={
+        "fast": ["orjson>=3.6"],
+        "stream": ["ijson>=3.1"],
+    },
     entry_points={
         "console_scripts": [
             "anchor=anchor_cli.main:main",